@@ -1,252 +1,119 @@
-import math
-import gurobipy as gp
-from gurobipy import GRB
-import pandas as pd
-import csv
-import time
+import sys
 import matplotlib.pyplot as plt
+from inputs import load_inputs, unit_data
+from profiler import finish_profile, stage, start_profile
+from results import write_results, plot_progress
 
 
-# Gurobi key
-options = {
-   "WLSACCESSID": "341449c4-53c6-46fb-a9d2-431c3bbb8aad",
-   "WLSSECRET": "037a1264-3f6f-481f-aaf3-b41016561e64",
-   "LICENSEID": 2555171,
-}
+# Stage profile of this run written to profiles/ (timers and RSS always; run with --trace-memory to add
+# tracemalloc peaks and with --cprofile to dump a cProfile of the slowest stage)
+start_profile('1_main', trace_memory='--trace-memory' in sys.argv, cprofile='--cprofile' in sys.argv)
 
 
-with gp.Env(params=options) as env, gp.Model(env=env) as model:
-   # Formulate problem
-   model.optimize()
+# Solver backend: 'gurobi' (needs the license below) or 'highs' (open source, runs offline on the 'site' formulation)
+BACKEND = 'gurobi'
 
 
-# Step 1: Load data from CSV files
-POI_df = pd.read_csv('POI.csv')  # Columns: ['Lat1', 'Lon1', 'Land_Cost', 'Unit']
-People_df = pd.read_csv('PEOPLE_OLD.csv')  # Columns: ['Lat2', 'Lon2', 'Unit']
-Constraint_df = pd.read_csv('CONSTRAINT.csv')  # Columns: ['Unit', 'Budget', 'Demand', 'Slot']
+if BACKEND == 'gurobi':
+   import gurobipy as gp
+   from solver import solve_unit
 
+   # Gurobi key
+   options = {
+      "WLSACCESSID": "341449c4-53c6-46fb-a9d2-431c3bbb8aad",
+      "WLSSECRET": "037a1264-3f6f-481f-aaf3-b41016561e64",
+      "LICENSEID": 2555171,
+   }
 
-# Ensure 'Land_Cost', 'Budget', 'Demand', and 'Slot' are numeric
-POI_df['Land_Cost'] = pd.to_numeric(POI_df['Land_Cost'], errors='coerce')
-Constraint_df['Budget'] = pd.to_numeric(Constraint_df['Budget'], errors='coerce')
-Constraint_df['Demand'] = pd.to_numeric(Constraint_df['Demand'], errors='coerce')
-Constraint_df['Slot'] = pd.to_numeric(Constraint_df['Slot'], errors='coerce')
+   with stage('license check'), gp.Env(params=options) as env, gp.Model(env=env) as model:
+      # Formulate problem
+      model.optimize()
+else:
+   from backends import solve_unit_with_backend
 
 
-# Earth's radius in kilometers for the Haversine formula
-R = 6371.0
-
-
-# Step 2: Define the Haversine function to calculate the distance between POIs and People nodes
-def haversine(lat1, lon1, lat2, lon2):
-   """
-   Calculate the great-circle distance between two points on the Earth
-   using the Haversine formula.
-   """
-   dlat = math.radians(lat2 - lat1)
-   dlon = math.radians(lat2 - lon1)
-   a = math.sin(dlat / 2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2)**2
-   return 2 * R * math.asin(math.sqrt(a))
-
-
-# Filter data for unit
 unit_name = "TP Thủ Đức"
-POI_group = POI_df[POI_df['Unit'] == unit_name]
-People_group = People_df[People_df['Unit'] == unit_name]
-Constraint_group = Constraint_df[Constraint_df['Unit'] == unit_name]
-
-
-Budget = Constraint_group['Budget'].values[0]
-Demand = Constraint_group['Demand'].values[0]
-Slot = Constraint_group['Slot'].values[0]
-
-
-print(f"Processing unit: {unit_name} with Budget: {Budget}, Demand: {Demand}, and Slot: {Slot}")
-
-
-# Print the number of columns in POI_group and People_group
-print(f"Number of columns in POI_group: {POI_group.shape[0]}")
-print(f"Number of columns in People_group: {People_group.shape[0]}")
 
 
-# Step 3: Initialize the optimization problem as a minimization problem
-model = gp.Model("Minimize_Charging_Cost")
+# Step 1: Load data from CSV files and filter data for unit
+with stage('load inputs'):
+   inputs = load_inputs('POI.csv', 'PEOPLE_OLD.csv', 'CONSTRAINT.csv')
+   POI_group, People_group, Budget, Demand, Slot = unit_data(unit_name, *inputs)
 
 
-# Step 4: Create decision variables as matrices for each POI-People pair (number of chargers: x2 and x3)
-x2 = model.addMVar((len(People_group), len(POI_group)), vtype=GRB.INTEGER, lb=0, ub=6, name="x2")
-x3 = model.addMVar((len(People_group), len(POI_group)), vtype=GRB.INTEGER, lb=0, ub=6, name="x3")
-b = model.addMVar((len(People_group), len(POI_group)), vtype=GRB.BINARY, name="b")
+# Model formulation: 'pair' (x2/x3/b per People-POI pair) or 'site' (charger counts per POI plus assignment flows)
+# Backends other than 'gurobi' always solve the 'site' formulation
+FORMULATION = 'pair'
 
 
-# Step 5: Define the objective function to minimize total cost (including fixed, land, and transportation costs)
-total_cost = gp.QuadExpr()  # Initialize a quadratic expression for the total cost
-loop_count = 0  # Initialize a counter for loops
-for i in range(len(POI_group)):
-   # Land cost contribution for POI i (proportional to the sum of chargers across all people)
-   land_cost = POI_group.iloc[i]['Land_Cost'] / 14_600 * (x2.sum(axis=0)[i] + x3.sum(axis=0)[i]) * b.sum(axis=0)[i]
-   fixed_cost = 439_621 * x2.sum(axis=0)[i] * b.sum(axis=0)[i] + 2_173_018  * x3.sum(axis=0)[i] * b.sum(axis=0)[i]
-   transportation_cost = gp.QuadExpr()
-   for j in range(len(People_group)):
-       dist = haversine(POI_group.iloc[i]['Lat1'], POI_group.iloc[i]['Lon1'], People_group.iloc[j]['Lat2'], People_group.iloc[j]['Lon2'])
-       transportation_cost += (38_868 * x2[j, i] + 212_005 * x3[j, i]) * dist * b[j, i]  # Cost depends on distance
-
-
-       # Increment the loop counter
-       loop_count += 1
-
-
-   # Add the total cost for this POI
-   total_cost += land_cost + fixed_cost + transportation_cost
-
-
-# After completing the loops, print the number of loops
-print(f"Total number of iterations for loops: {loop_count}")
-
-
-# Set the objective function to minimize the total cost
-model.setObjective(total_cost, GRB.MINIMIZE)
-
-
-# Step 6: Add constraints
-model.addConstr(
-   (21_349 * x2.sum() + 90_784 * x3.sum()) <= (Budget / 3650),
-   "Total_Charger_Upper_Bound"
-)
-model.addConstr(
-   (52.8 * x2.sum() + 288 * x3.sum()) >= Demand,
-   "Total_Charger_Lower_Bound"
-)
-# model.addConstr(
-#    (x2.sum() + x3.sum()) <= Slot,
-#    "Total_Charger_Slot_Bound"
-# )
-for i in range(len(POI_group)):
-   for j in range(len(People_group)):
-       model.addConstr((b[j, i] == 0) >> (x2[j, i] + x3[j, i] == 0), "if else constraint_1")
-       model.addConstr((b[j, i] == 1) >> (x2[j, i] + x3[j, i] >= 1), "if else constraint_2")
-for i in range(len(POI_group)):
-   model.addConstr(x2.sum(axis=0)[i] <= 6)
-   model.addConstr(x3.sum(axis=0)[i] <= 6)
-
+# Solve the 'pair' model as a pure MILP (exact linear reformulation of the x*b products) instead of the nonconvex MIQP
+LINEARIZE = False
 
-# Define the callback function to collect data during optimization
-def data_cb(model, where):
-   if where == gp.GRB.Callback.MIP:
-       cur_obj = model.cbGet(gp.GRB.Callback.MIP_OBJBST)
-       cur_bd = model.cbGet(gp.GRB.Callback.MIP_OBJBND)
 
+# Candidate pruning: only pair each People node with its K_NEAREST POIs and/or the POIs within RADIUS_KM (None = all pairs)
+K_NEAREST = None
+RADIUS_KM = None
 
-       # Did objective value or best bound change?
-       if model._obj != cur_obj or model._bd != cur_bd:
-           model._obj = cur_obj
-           model._bd = cur_bd
-           model._data.append([time.perf_counter() - model._start, cur_obj, cur_bd])  # Higher precision time capture
 
+# Road-network distances: None (straight-line haversine) or the path of a local OSM extract, e.g. 'road_test.osm'
+ROAD_GRAPH = None
 
-# Initialize callback data
-model._obj = None
-model._bd = None
-model._data = []
-model._start = time.perf_counter()  # Start with high-precision timer
 
+# MIP start: None, 'heuristic' (greedy + local search) or the path of an earlier results_unit_*.parquet/.csv file
+MIP_START = None
 
-# Step 7: Solve the problem using Gurobi's solver with the callback function
-model.setParam('MIPGap', 0.0001)
-model.optimize(callback=data_cb)
 
-# Extract and save results
-x2_values = x2.X
-x3_values = x3.X
-b_values = b.X
-optimal_solution = model.ObjVal
+# Cache the built model on disk and reuse it when the unit's inputs did not change; run with --rebuild-model to invalidate it
+MODEL_CACHE = True
+REBUILD_MODEL = '--rebuild-model' in sys.argv
 
 
-# Save results to a single CSV file
-with open(f'result_x2_x3/results_unit_{unit_name}.csv', 'w', newline='') as f:
-   writer = csv.writer(f)
-  
-   # Write x2 values
-   writer.writerow(['x2 values'])
-   writer.writerows(x2_values)
-  
-   # Write x3 values
-   writer.writerow([])
-   writer.writerow(['x3 values'])
-   writer.writerows(x3_values)
-  
-   # Write b values
-   writer.writerow
-   writer.writerow(['b values'])
-   writer.writerows(b_values)
-  
-   # Write optimal solution
-   writer.writerow([])
-   writer.writerow(['Optimal Solution'])
-   writer.writerow([optimal_solution])
+# Solver telemetry (node count, gap, incumbents, presolve) written to telemetry/: None, 'jsonl' or 'parquet'
+TELEMETRY = 'jsonl'
 
 
-# Save callback data to a CSV file
-callback_data_filename = f'data_time/data_{unit_name}.csv'
-with open(callback_data_filename, 'w', newline='') as f:
-   writer = csv.writer(f)
-   writer.writerow(['Time', 'Objective Value', 'Best Bound'])
-   writer.writerows(model._data)
-
-
-# Save callback data to a CSV file
-callback_data_filename = f'data_time/data_{unit_name}.csv'
-with open(callback_data_filename, 'w', newline='') as f:
-   writer = csv.writer(f)
-   writer.writerow(['Time', 'Objective Value', 'Best Bound'])
-   writer.writerows(model._data)
-
-
-# Step 8: Plot the results from 'data_{unit_name}.csv'
-# Load the saved data
-data = pd.read_csv(callback_data_filename)
-data = data.iloc[:]  # Exclude the first row
-# Verify the first few rows to ensure correct loading
-print(data.head())
-
-
-# Step 2: Plotting Best Bound and Objective Value over Time
-plt.figure(figsize=(12, 8))
-
-
-# Plot the Objective Value with markers for clear visibility
-plt.plot(data['Time'], data['Objective Value'], label='Objective Value', color='orange', linewidth=2, marker='o')
-
-
-# Plot the Best Bound with a dashed line and markers
-plt.plot(data['Time'], data['Best Bound'], label='Best Bound', color='gray', linewidth=2, linestyle='--', marker='x')
+print(f"Processing unit: {unit_name} with Budget: {Budget}, Demand: {Demand}, and Slot: {Slot}")
 
 
-# Adding labels and title with adjustments for clarity
-plt.xlabel('Time (seconds)', fontsize=14)
-plt.ylabel('Value', fontsize=14)
-plt.title(f'{unit_name}', fontsize=16)
+# Print the number of columns in POI_group and People_group
+print(f"Number of columns in POI_group: {POI_group.shape[0]}")
+print(f"Number of columns in People_group: {People_group.shape[0]}")
 
 
-# Use logarithmic scale for the y-axis
+# Step 2-7: Load the cached distance matrix, build the model in matrix form and solve it with the callback
+if BACKEND == 'gurobi':
+   with stage('solve'):
+      result = solve_unit(unit_name, inputs=inputs, formulation=FORMULATION, linearize=LINEARIZE, mip_gap=0.0001,
+                          k_nearest=K_NEAREST, radius_km=RADIUS_KM, start=MIP_START,
+                          model_cache=MODEL_CACHE, rebuild_model=REBUILD_MODEL, telemetry=TELEMETRY,
+                          road_graph=ROAD_GRAPH)
+   print(f"Time to first incumbent: {result['first_incumbent_time']} seconds")
+   if result['telemetry'] is not None:
+      print(f"Time to 1% gap: {result['telemetry']['time_to_1%']} seconds, to 0.1% gap: "
+            f"{result['telemetry']['time_to_0.1%']} seconds, to the target gap: {result['telemetry']['time_to_target']} seconds")
+else:
+   with stage('solve'):
+      result = solve_unit_with_backend(unit_name, backend=BACKEND, inputs=inputs, mip_gap=0.0001,
+                                       k_nearest=K_NEAREST, radius_km=RADIUS_KM, road_graph=ROAD_GRAPH)
+print(f"Model build time: {result['build_time']:.3f} seconds, solve time: {result['solve_time']:.3f} seconds")
 
 
-plt.yscale('log')
-# Adding grid for better readability
-plt.grid(True, linestyle='--', alpha=0.7)
+# Save the sparse results (Parquet) and the callback data (CSV)
+with stage('write results'):
+   callback_data_filename = write_results(result)
 
 
-# Display the legend to distinguish between the lines
-plt.legend()
+# Step 8: Plot the Best Bound and Objective Value over Time from 'data_{unit_name}.csv'
+with stage('plot'):
+   plot_filename = plot_progress(unit_name, callback_data_filename)
 
 
-# Save the plot with a filename associated with the unit name
-plot_filename = f'plot_name/plot_{unit_name}.png'
-plt.savefig(plot_filename)
+# Write the stage profile (before the blocking plot window)
+finish_profile()
 
 
 # Show the plot
 plt.show()
 
 
-print(f"The plot has been saved as {plot_filename}.")
\ No newline at end of file
+print(f"The plot has been saved as {plot_filename}.")
@@ -0,0 +1,230 @@
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from candidates import all_pairs, candidate_pairs, pair_values, poi_sum_matrix, pruning_report
+from costs import DEFAULT_COSTS
+from distance_matrix import unit_distance_matrix
+from inputs import load_inputs, unit_data
+from profiler import stage
+
+
+def site_milp(POI_group, dist, Budget, Demand, costs=None, pairs=None):
+    """
+    Solver-neutral arrays of the site formulation (see
+    model_builder.build_site_model): minimize c @ x subject to
+    row_lb <= A @ x <= row_ub, lb <= x <= ub, with the integer columns
+    flagged in integer. The column ranges of each variable group are kept
+    in 'columns' so the solution can be split back into x2/x3 flows.
+    """
+    costs = {**DEFAULT_COSTS, **(costs or {})}
+    start = time.perf_counter()
+
+    n_people, n_poi = dist.shape
+    rows, cols = pairs if pairs is not None else all_pairs(n_people, n_poi)
+    n_pairs = len(rows)
+    dist_pairs = np.asarray(dist[rows, cols], dtype=float)
+    land_coef = POI_group['Land_Cost'].to_numpy(dtype=float) / costs['land_divisor']
+    cap = costs['site_cap']
+
+    # Columns: y2 | y3 | o (per POI), x2 | x3 (per pair)
+    columns = {}
+    offset = 0
+    for name, size in (('y2', n_poi), ('y3', n_poi), ('o', n_poi), ('x2', n_pairs), ('x3', n_pairs)):
+        columns[name] = slice(offset, offset + size)
+        offset += size
+
+    c = np.concatenate([
+        land_coef + costs['fixed_x2'],
+        land_coef + costs['fixed_x3'],
+        np.zeros(n_poi),
+        costs['transport_x2'] * dist_pairs,
+        costs['transport_x3'] * dist_pairs,
+    ])
+    lb = np.zeros(offset)
+    ub = np.concatenate([np.full(2 * n_poi, float(cap)), np.ones(n_poi), np.full(2 * n_pairs, np.inf)])
+    integer = np.concatenate([np.ones(3 * n_poi, dtype=bool), np.zeros(2 * n_pairs, dtype=bool)])
+
+    # Constraint rows
+    ones = sp.csr_matrix(np.ones((1, n_poi)))
+    eye = sp.identity(n_poi, format='csr')
+    to_poi = poi_sum_matrix(cols, n_poi)
+    A = sp.bmat([
+        [costs['capex_x2'] * ones, costs['capex_x3'] * ones, None, None, None],        # Total_Charger_Upper_Bound
+        [costs['capacity_x2'] * ones, costs['capacity_x3'] * ones, None, None, None],  # Total_Charger_Lower_Bound
+        [-eye, None, None, to_poi, None],                                              # Assign_x2
+        [None, -eye, None, None, to_poi],                                              # Assign_x3
+        [eye, None, -cap * eye, None, None],                                           # Open_x2
+        [None, eye, -cap * eye, None, None],                                           # Open_x3
+        [eye, eye, -eye, None, None],                                                  # Open_Site
+    ], format='csr')
+    zeros = np.zeros(n_poi)
+    row_lb = np.concatenate([[-np.inf], [Demand], zeros, zeros, np.full(2 * n_poi, -np.inf), zeros])
+    row_ub = np.concatenate([[Budget / costs['budget_days']], [np.inf], zeros, zeros, zeros, zeros, np.full(n_poi, np.inf)])
+
+    return {
+        'c': c, 'A': A, 'row_lb': row_lb, 'row_ub': row_ub, 'lb': lb, 'ub': ub, 'integer': integer,
+        'columns': columns, 'pairs': (rows, cols), 'shape': (n_people, n_poi),
+        'build_time': time.perf_counter() - start,
+    }
+
+
+class GurobiBackend:
+    """Gurobi through gurobipy (needs a license)."""
+
+    name = 'gurobi'
+
+    def solve(self, milp, mip_gap=0.0001, time_limit=None, threads=None):
+        import gurobipy as gp
+        from gurobipy import GRB
+
+        with gp.Env() as env, gp.Model(env=env) as model:
+            vtype = np.where(milp['integer'], GRB.INTEGER, GRB.CONTINUOUS)
+            x = model.addMVar(len(milp['c']), lb=milp['lb'], ub=milp['ub'], vtype=vtype, name="x")
+            model.setObjective(milp['c'] @ x, GRB.MINIMIZE)
+
+            A, row_lb, row_ub = milp['A'], milp['row_lb'], milp['row_ub']
+            equal = row_lb == row_ub
+            less = np.isfinite(row_ub) & ~equal
+            greater = np.isfinite(row_lb) & ~equal
+            model.addConstr(A[equal] @ x == row_ub[equal])
+            model.addConstr(A[less] @ x <= row_ub[less])
+            model.addConstr(A[greater] @ x >= row_lb[greater])
+
+            model.setParam('MIPGap', mip_gap)
+            if time_limit is not None:
+                model.setParam('TimeLimit', time_limit)
+            if threads is not None:
+                model.setParam('Threads', threads)
+            model.optimize()
+            if model.SolCount == 0:
+                raise RuntimeError(f"Gurobi found no feasible solution (status {model.Status})")
+
+            return {
+                'x': x.X,
+                'objective': model.ObjVal,
+                'mip_gap': model.MIPGap,
+                'solve_time': model.Runtime,
+                'status': model.Status,
+            }
+
+
+def highs_model(milp, mip_gap=0.0001, time_limit=None, threads=None):
+    """highspy.Highs instance holding the arrays of site_milp(), ready to run()."""
+    import highspy
+
+    A = milp['A'].tocsc()
+    lp = highspy.HighsLp()
+    lp.num_col_ = A.shape[1]
+    lp.num_row_ = A.shape[0]
+    lp.col_cost_ = milp['c']
+    lp.col_lower_ = milp['lb']
+    lp.col_upper_ = np.where(np.isfinite(milp['ub']), milp['ub'], highspy.kHighsInf)
+    lp.row_lower_ = np.where(np.isfinite(milp['row_lb']), milp['row_lb'], -highspy.kHighsInf)
+    lp.row_upper_ = np.where(np.isfinite(milp['row_ub']), milp['row_ub'], highspy.kHighsInf)
+    lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+    lp.a_matrix_.start_ = A.indptr
+    lp.a_matrix_.index_ = A.indices
+    lp.a_matrix_.value_ = A.data
+    lp.integrality_ = [highspy.HighsVarType.kInteger if flag else highspy.HighsVarType.kContinuous
+                       for flag in milp['integer']]
+
+    h = highspy.Highs()
+    h.setOptionValue('output_flag', False)
+    h.setOptionValue('mip_rel_gap', mip_gap)
+    if time_limit is not None:
+        h.setOptionValue('time_limit', float(time_limit))
+    if threads is not None:
+        h.setOptionValue('threads', int(threads))
+    h.passModel(lp)
+    return h
+
+
+def run_highs(h):
+    """
+    Solve a highs_model() and return the solution dict of the backends;
+    x is None when HiGHS has no feasible primal solution (infeasible
+    model, or a time limit reached before the first incumbent).
+    """
+    import highspy
+
+    start = time.perf_counter()
+    h.run()
+    solve_time = time.perf_counter() - start
+
+    info = h.getInfo()
+    feasible = info.primal_solution_status == int(highspy.SolutionStatus.kSolutionStatusFeasible)
+    return {
+        'x': np.asarray(h.getSolution().col_value) if feasible else None,
+        'objective': info.objective_function_value,
+        'mip_gap': info.mip_gap,
+        'solve_time': solve_time,
+        'status': h.modelStatusToString(h.getModelStatus()),
+    }
+
+
+class HighsBackend:
+    """HiGHS through highspy (open source, no license or network needed)."""
+
+    name = 'highs'
+
+    def solve(self, milp, mip_gap=0.0001, time_limit=None, threads=None):
+        solution = run_highs(highs_model(milp, mip_gap=mip_gap, time_limit=time_limit, threads=threads))
+        if solution['x'] is None:
+            raise RuntimeError(f"HiGHS found no feasible solution (status {solution['status']})")
+        return solution
+
+
+BACKENDS = {'gurobi': GurobiBackend, 'highs': HighsBackend}
+
+
+def solve_unit_with_backend(unit_name, backend='highs', inputs=None, mip_gap=0.0001, time_limit=None, threads=None,
+                            k_nearest=None, radius_km=None, costs=None, road_graph=None,
+                            poi_path='POI.csv', people_path='PEOPLE_OLD.csv'):
+    """
+    Solve the site formulation of one unit with any backend of BACKENDS.
+
+    Returns the same result dict as solver.solve_unit, so write_results()
+    and the later pipeline stages work unchanged. There is no callback
+    trace, so callback_data is empty.
+    """
+    if inputs is None:
+        inputs = load_inputs(poi_path, people_path)
+    POI_group, People_group, Budget, Demand, Slot = unit_data(unit_name, *inputs)
+    with stage('distance matrix'):
+        dist_matrix = unit_distance_matrix(unit_name, poi_path, people_path, road_graph=road_graph)
+
+    with stage('candidate pairs'):
+        pairs = candidate_pairs(People_group, POI_group, k_nearest=k_nearest, radius_km=radius_km,
+                                dist=dist_matrix if road_graph is not None else None)
+    with stage('model build'):
+        milp = site_milp(POI_group, dist_matrix, Budget, Demand, costs=costs, pairs=pairs)
+    with stage('optimize'):
+        try:
+            solution = BACKENDS[backend]().solve(milp, mip_gap=mip_gap, time_limit=time_limit, threads=threads)
+        except RuntimeError as e:
+            raise RuntimeError(f"{unit_name}: {e}") from e
+
+    with stage('extract'):
+        columns = milp['columns']
+        x2_values = pair_values(solution['x'][columns['x2']], milp['pairs'], milp['shape'])
+        x3_values = pair_values(solution['x'][columns['x3']], milp['pairs'], milp['shape'])
+
+    return {
+        'unit': unit_name,
+        'formulation': 'site',
+        'backend': backend,
+        'x2_values': x2_values,
+        'x3_values': x3_values,
+        'b_values': (x2_values + x3_values > 0.5).astype(float),
+        'optimal_solution': solution['objective'],
+        'build_time': milp['build_time'],
+        'solve_time': solution['solve_time'],
+        'mip_gap': solution['mip_gap'],
+        'status': solution['status'],
+        'pruning': pruning_report(pairs, *milp['shape'], formulation='site'),
+        'poi_coordinates': POI_group[['Lat1', 'Lon1']].to_numpy(dtype=float),
+        'people_coordinates': People_group[['Lat2', 'Lon2']].to_numpy(dtype=float),
+        'callback_data': [],
+    }
@@ -0,0 +1,120 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use('Agg')  # Workers only save the plots
+
+import gurobipy as gp
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from distance_matrix import build_distance_cache
+from inputs import load_inputs
+from results import plot_progress, result_file, write_results
+from solver import solve_unit
+from telemetry import summary_table
+
+
+def unit_sizes(units, POI_df, People_df):
+    """POI x People pair count of every unit, largest first."""
+    poi_counts = POI_df['Unit'].value_counts()
+    people_counts = People_df['Unit'].value_counts()
+    sizes = {unit: int(poi_counts.get(unit, 0) * people_counts.get(unit, 0)) for unit in units}
+    return sorted(sizes.items(), key=lambda item: item[1], reverse=True)
+
+
+def solve_and_save(unit_name, threads, solve_options, start_source=None):
+    """Worker: solve one unit with its own Gurobi environment and write its artifacts."""
+    start = time.perf_counter()
+    mip_start = result_file(unit_name) if start_source == 'stored' else start_source
+    with gp.Env() as env:
+        result = solve_unit(unit_name, env=env, params={'Threads': threads}, start=mip_start, **solve_options)
+    callback_data_filename = write_results(result)
+    plot_progress(unit_name, callback_data_filename)
+    plt.close('all')
+    return unit_name, result['optimal_solution'], result['solve_time'], result['first_incumbent_time'], time.perf_counter() - start
+
+
+def solve_all(units, workers=None, solve_options=None, start_source=None):
+    """
+    Solve every unit across a process pool.
+
+    The machine's cores are split between the concurrent solves through
+    the solver Threads parameter, and the largest units (by POI x People
+    count) are submitted first so the pool's wall-clock time stays close
+    to the longest single solve.
+    """
+    inputs = load_inputs('POI.csv', 'PEOPLE_OLD.csv', 'CONSTRAINT.csv')
+    ordered = unit_sizes(units, inputs[0], inputs[1])
+
+    # Build the distance cache once here, so the workers only read it
+    road_graph = (solve_options or {}).get('road_graph')
+    if road_graph is not None:
+        from road_network import build_road_distance_cache
+        build_road_distance_cache(road_graph, 'POI.csv', 'PEOPLE_OLD.csv')
+    else:
+        build_distance_cache('POI.csv', 'PEOPLE_OLD.csv')
+
+    cores = os.cpu_count() or 1
+    workers = min(workers or cores, len(ordered))
+    threads = max(1, cores // workers)
+    print(f"Solving {len(ordered)} units with {workers} workers x {threads} threads")
+
+    start = time.perf_counter()
+    summary = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(solve_and_save, unit, threads, solve_options or {}, start_source): unit
+                   for unit, _ in ordered}
+        for future in as_completed(futures):
+            # A failing unit is recorded with its error; the other units keep going
+            try:
+                unit_name, objective, solve_time, first_incumbent, unit_time = future.result()
+            except Exception as e:
+                summary.append({'Unit': futures[future], 'Error': f'{type(e).__name__}: {e}'})
+                print(f"{futures[future]}: failed with {type(e).__name__}: {e}")
+                continue
+            summary.append({'Unit': unit_name, 'Objective': objective, 'Solve time': solve_time,
+                            'First incumbent': first_incumbent, 'Unit time': unit_time, 'Error': None})
+            print(f"{unit_name}: objective {objective:.2f}, solved in {solve_time:.2f}s, first incumbent after {first_incumbent}s")
+
+    wall_time = time.perf_counter() - start
+    summary_df = pd.DataFrame(summary, columns=['Unit', 'Objective', 'Solve time', 'First incumbent', 'Unit time', 'Error'])
+    failed = summary_df['Error'].notna()
+    print(f"Wall-clock time: {wall_time:.2f}s, sum of unit times: {summary_df['Unit time'].sum():.2f}s, "
+          f"longest unit: {summary_df['Unit time'].max():.2f}s, failed units: {int(failed.sum())}")
+    if failed.any():
+        print(summary_df.loc[failed, ['Unit', 'Error']].to_string(index=False))
+    return summary_df
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve every unit of Unit.csv in parallel.')
+    parser.add_argument('--workers', type=int, default=None, help='Concurrent solves (default: one per core)')
+    parser.add_argument('--formulation', choices=['pair', 'site'], default='pair')
+    parser.add_argument('--linearize', action='store_true', help='Solve the pair model as a pure MILP')
+    parser.add_argument('--k-nearest', type=int, default=None)
+    parser.add_argument('--radius-km', type=float, default=None)
+    parser.add_argument('--road-graph', default=None, help='Price transportation on the road distances of this OSM extract')
+    parser.add_argument('--start', choices=['heuristic', 'stored'], default=None,
+                        help='MIP start from the heuristic or from the existing result_x2_x3/ files')
+    parser.add_argument('--model-cache', action='store_true', help='Reuse built models from cache/models')
+    parser.add_argument('--rebuild-model', action='store_true', help='Ignore and overwrite the cached models')
+    parser.add_argument('--telemetry', choices=['jsonl', 'parquet'], default=None,
+                        help='Record the solver telemetry of every unit to telemetry/')
+    args = parser.parse_args()
+
+    solve_all(
+        pd.read_csv('Unit.csv')['Unit'],
+        workers=args.workers,
+        solve_options={'formulation': args.formulation, 'linearize': args.linearize,
+                       'k_nearest': args.k_nearest, 'radius_km': args.radius_km, 'road_graph': args.road_graph,
+                       'model_cache': args.model_cache, 'rebuild_model': args.rebuild_model,
+                       'telemetry': args.telemetry},
+        start_source=args.start,
+    )
+
+    # Time to first incumbent, 1%, 0.1% and target gap of every unit
+    if args.telemetry:
+        print(summary_table().to_string(index=False))
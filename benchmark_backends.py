@@ -0,0 +1,47 @@
+import importlib.util
+import os
+
+import pandas as pd
+
+from backends import BACKENDS, solve_unit_with_backend
+from inputs import load_inputs
+
+
+# Build time, solve time, objective and gap of every available backend on every unit
+MIP_GAP = 0.0001
+TIME_LIMIT = 600
+output_file_path = 'benchmark/backends.csv'
+
+# Backends whose Python package is installed on this machine
+modules = {'gurobi': 'gurobipy', 'highs': 'highspy'}
+backends = [name for name in BACKENDS if importlib.util.find_spec(modules[name]) is not None]
+
+inputs = load_inputs('POI.csv', 'PEOPLE_OLD.csv', 'CONSTRAINT.csv')
+units = pd.read_csv('Unit.csv')['Unit']
+
+rows = []
+for unit in units:
+    for backend in backends:
+        try:
+            result = solve_unit_with_backend(unit, backend, inputs=inputs, mip_gap=MIP_GAP, time_limit=TIME_LIMIT)
+        except Exception as e:  # e.g. no Gurobi license on this machine
+            print(f"{unit} with {backend} failed: {e}")
+            continue
+        rows.append({
+            'Unit': unit,
+            'Backend': backend,
+            'Build time': result['build_time'],
+            'Solve time': result['solve_time'],
+            'Objective': result['optimal_solution'],
+            'Gap': result['mip_gap'],
+            'Status': result['status'],
+        })
+        print(f"{unit} with {backend}: objective {result['optimal_solution']:.2f}, "
+              f"gap {result['mip_gap']:.2e}, solved in {result['solve_time']:.2f}s")
+
+benchmark_df = pd.DataFrame(rows)
+os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+benchmark_df.to_csv(output_file_path, index=False)
+
+print(f"Benchmark saved to {output_file_path}")
+print(benchmark_df.groupby('Backend')[['Build time', 'Solve time']].sum())
@@ -0,0 +1,43 @@
+import os
+
+import pandas as pd
+
+from solver import load_inputs, unit_data, solve_unit
+
+
+# Compare the pruned candidate-pair model with the full model on every unit
+FORMULATION = 'pair'
+K_NEAREST = 5
+RADIUS_KM = 2.0
+MAX_FULL_PAIRS = 1_000  # Units with more People x POI pairs are only solved pruned
+output_file_path = 'benchmark/candidates.csv'
+
+inputs = load_inputs('POI.csv', 'PEOPLE_OLD.csv', 'CONSTRAINT.csv')
+units = pd.read_csv('Unit.csv')['Unit']
+
+rows = []
+for unit in units:
+    POI_group, People_group, Budget, Demand, Slot = unit_data(unit, *inputs)
+    pruned = solve_unit(unit, inputs=inputs, formulation=FORMULATION, k_nearest=K_NEAREST, radius_km=RADIUS_KM)
+
+    row = {'Unit': unit, **pruned['pruning'],
+           'Pruned build time': pruned['build_time'],
+           'Pruned solve time': pruned['solve_time'],
+           'Pruned objective': pruned['optimal_solution']}
+
+    # Optimality loss, on units small enough to also solve with every pair
+    if len(POI_group) * len(People_group) <= MAX_FULL_PAIRS:
+        full = solve_unit(unit, inputs=inputs, formulation=FORMULATION)
+        row['Full build time'] = full['build_time']
+        row['Full solve time'] = full['solve_time']
+        row['Full objective'] = full['optimal_solution']
+        row['Optimality loss'] = (pruned['optimal_solution'] - full['optimal_solution']) / abs(full['optimal_solution'])
+
+    rows.append(row)
+    print(f"{unit}: pruned {row['pruned_variables']} variables, optimality loss: {row.get('Optimality loss', 'n/a')}")
+
+benchmark_df = pd.DataFrame(rows)
+os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+benchmark_df.to_csv(output_file_path, index=False)
+
+print(f"Benchmark saved to {output_file_path}")
@@ -0,0 +1,64 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from combined_output import combine_units
+
+
+# Extraction time of 2.combined_latlon.py on enlarged synthetic units (input_visualize format)
+N_PEOPLE = 200
+POI_COUNTS = [1_000, 2_000, 4_000, 8_000]
+UNITS_PER_SIZE = 4  # Units processed concurrently at every size
+SEED = 0
+synthetic_dir = 'cache/synthetic_visualize'
+output_file_path = 'benchmark/combined.csv'
+
+
+def write_synthetic_unit(file_path, n_people, n_poi, rng):
+    """input_visualize file with random POI/person coordinates and ~1% of the x2/x3 cells between 1 and 6."""
+    poi_lat = rng.uniform(10.7, 10.9, n_poi)
+    poi_lon = rng.uniform(106.6, 106.8, n_poi)
+    person = np.column_stack([rng.uniform(10.7, 10.9, n_people), rng.uniform(106.6, 106.8, n_people)])
+
+    def matrix():
+        values = rng.integers(1, 7, (n_people, n_poi)) * (rng.random((n_people, n_poi)) < 0.01)
+        return pd.DataFrame(np.column_stack([person, values]))
+
+    header = pd.DataFrame([[None, None, *poi_lat], [None, 'x2 values', *poi_lon]])
+    x3_marker = pd.DataFrame([[None, 'x3 values', *poi_lon]])
+    pd.concat([header, matrix(), x3_marker, matrix()]).to_csv(file_path, header=False, index=False)
+
+
+def main():
+    """Time combine_units on every size of POI_COUNTS and save the table to output_file_path."""
+    rng = np.random.default_rng(SEED)
+    os.makedirs(synthetic_dir, exist_ok=True)
+
+    rows = []
+    for n_poi in POI_COUNTS:
+        units = [f'synthetic_{n_poi}_{index}' for index in range(UNITS_PER_SIZE)]
+        for unit in units:
+            write_synthetic_unit(f'{synthetic_dir}/{unit}.csv', N_PEOPLE, n_poi, rng)
+
+        start = time.perf_counter()
+        combined_df = combine_units(units, workers=UNITS_PER_SIZE, input_dir=synthetic_dir, output_dir=synthetic_dir)
+        wall_time = time.perf_counter() - start
+
+        cells = 2 * N_PEOPLE * n_poi * UNITS_PER_SIZE
+        rows.append({'POI per unit': n_poi, 'People per unit': N_PEOPLE, 'Units': UNITS_PER_SIZE, 'Cells': cells,
+                     'Nonzero entries': len(combined_df), 'Wall time': wall_time,
+                     'Seconds per million cells': wall_time / cells * 1e6})
+        print(f"{n_poi} POI per unit: {len(combined_df)} entries in {wall_time:.2f}s")
+
+    benchmark_df = pd.DataFrame(rows)
+    os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+    benchmark_df.to_csv(output_file_path, index=False)
+
+    print(f"Benchmark saved to {output_file_path}")
+    print(benchmark_df[['POI per unit', 'Wall time', 'Seconds per million cells']])
+
+
+if __name__ == '__main__':
+    main()
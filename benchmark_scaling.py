@@ -0,0 +1,110 @@
+import argparse
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+
+import pandas as pd
+
+from backends import BACKENDS, site_milp
+from candidates import candidate_pairs, pair_values
+from combined_output import sparse_entries
+from distance_matrix import build_distance_cache, cache_folder, unit_distance_matrix
+from inputs import load_inputs, store_file, unit_data
+from map_builder import build_map
+from profiler import Profiler
+from results import write_sparse_results
+from synthetic import write_synthetic_inputs
+
+
+# Wall time and peak RSS of every pipeline stage on synthetic units of growing size
+POI_COUNTS = [250, 500, 1_000, 2_000, 4_000, 8_000]
+TIME_LIMIT = 60
+K_NEAREST = 3
+synthetic_dir = 'cache/synthetic'
+output_file_path = 'benchmark/scaling.csv'
+
+
+def run_instance(n_poi, n_people, seed, backend, time_limit, k_nearest):
+    """Generate one synthetic unit and time every stage on it (run in a fresh process)."""
+    folder = os.path.join(synthetic_dir, f'{n_poi}_{n_people}_{seed}')
+    poi_path, people_path, constraint_path = write_synthetic_inputs(folder, n_poi, n_people, seed)
+
+    # The synthetic inputs (and so their cache keys) are the same for a given seed: drop the stored tables and
+    # distance matrices so every run measures the cold ingest and build
+    for path in (poi_path, people_path, constraint_path):
+        if os.path.exists(store_file(path)):
+            os.remove(store_file(path))
+    shutil.rmtree(cache_folder(poi_path, people_path), ignore_errors=True)
+
+    profiler = Profiler(f'scaling_{n_poi}', interval=0.005)
+    with profiler.stage('ingest'):
+        inputs = load_inputs(poi_path, people_path, constraint_path)
+        POI_group, People_group, Budget, Demand, Slot = unit_data('Synthetic', *inputs)
+
+    with profiler.stage('distance'):
+        build_distance_cache(poi_path, people_path)
+        dist = unit_distance_matrix('Synthetic', poi_path, people_path)
+
+    with profiler.stage('build'):
+        pairs = candidate_pairs(People_group, POI_group, k_nearest=k_nearest)
+        milp = site_milp(POI_group, dist, Budget, Demand, pairs=pairs)
+
+    with profiler.stage('solve'):
+        solution = BACKENDS[backend]().solve(milp, time_limit=time_limit)
+
+    with profiler.stage('extract'):
+        columns = milp['columns']
+        result = {
+            'unit': 'Synthetic',
+            'formulation': 'site',
+            'backend': backend,
+            'x2_values': pair_values(solution['x'][columns['x2']], milp['pairs'], milp['shape']),
+            'x3_values': pair_values(solution['x'][columns['x3']], milp['pairs'], milp['shape']),
+            'optimal_solution': solution['objective'],
+            'poi_coordinates': POI_group[['Lat1', 'Lon1']].to_numpy(dtype=float),
+            'people_coordinates': People_group[['Lat2', 'Lon2']].to_numpy(dtype=float),
+        }
+        entries = sparse_entries('Synthetic', write_sparse_results(result, folder))
+
+    with profiler.stage('map'):
+        no_stations = pd.DataFrame({'Unit': [], 'Name': [], 'Type': [], 'Value': [], 'x coordinate': [],
+                                    'y coordinate': []}).astype({'Unit': str, 'Name': str, 'Type': str})
+        build_map(entries, no_stations, People_group, output_map=os.path.join(folder, 'map.html'))
+
+    profiler.stop()
+    return [{'POI': n_poi, 'People': n_people, 'Pairs': len(milp['pairs'][0]), 'Backend': backend,
+             'Stage': record['name'], 'Wall time': record['wall_time'], 'Peak RSS (MB)': record['peak_rss_mb'],
+             'Objective': solution['objective'], 'Status': solution['status']} for record in profiler.stages]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scaling benchmark of every pipeline stage on synthetic units.')
+    parser.add_argument('--poi', type=int, nargs='+', default=POI_COUNTS)
+    parser.add_argument('--people-ratio', type=float, default=0.1, help='Demand nodes per POI')
+    parser.add_argument('--backend', choices=list(BACKENDS), default='highs')
+    parser.add_argument('--time-limit', type=float, default=TIME_LIMIT)
+    parser.add_argument('--k-nearest', type=int, default=K_NEAREST)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rows = []
+    for n_poi in args.poi:
+        n_people = max(1, int(n_poi * args.people_ratio))
+        # A fresh process per instance, so the peak RSS of one size does not carry over to the next
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            instance_rows = executor.submit(run_instance, n_poi, n_people, args.seed, args.backend,
+                                            args.time_limit, args.k_nearest).result()
+        rows.extend(instance_rows)
+        print(f"{n_poi} POI x {n_people} people: " +
+              ', '.join(f"{row['Stage']} {row['Wall time']:.2f}s/{row['Peak RSS (MB)']:.0f}MB" for row in instance_rows))
+
+    benchmark_df = pd.DataFrame(rows)[['POI', 'People', 'Pairs', 'Backend', 'Stage', 'Wall time', 'Peak RSS (MB)',
+                                       'Objective', 'Status']]
+    os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+    benchmark_df.to_csv(output_file_path, index=False)
+
+    print(f"Benchmark saved to {output_file_path}")
+    print(benchmark_df.pivot(index='POI', columns='Stage', values='Wall time'))
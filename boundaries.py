@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+
+import shapely
+from shapely.geometry import mapping, shape
+
+from inputs import file_fingerprint
+
+
+# Folder where the simplified boundary files are stored
+CACHE_DIR = 'cache/boundaries'
+
+# Douglas-Peucker tolerance (degrees, ~11 m) and number of decimals kept (~1 m)
+TOLERANCE = 0.0001
+PRECISION = 5
+
+
+def district_features(geojson_data):
+    """Named Polygon/MultiPolygon features of the boundary file (the unnamed admin points are skipped)."""
+    return [feature for feature in geojson_data['features']
+            if feature['properties'].get('name') and feature['geometry']['type'] in ('Polygon', 'MultiPolygon')]
+
+
+def simplify_features(features, tolerance=TOLERANCE, precision=PRECISION):
+    """
+    Douglas-Peucker simplification of every district (topology preserving,
+    so no polygon self-intersects or loses a ring), then snap-rounding of
+    the coordinates to the given number of decimals. Only the district
+    name is kept from the properties.
+    """
+    geometries = shapely.simplify([shape(feature['geometry']) for feature in features], tolerance, preserve_topology=True)
+    geometries = shapely.set_precision(geometries, 10 ** -precision)
+    return [{'type': 'Feature', 'properties': {'name': feature['properties']['name']}, 'geometry': mapping(geometry)}
+            for feature, geometry in zip(features, geometries)]
+
+
+def simplified_boundaries(boundary_file='hcm.geojson', tolerance=TOLERANCE, precision=PRECISION):
+    """
+    FeatureCollection of the simplified districts, cached by the hash of
+    the boundary file and the simplification settings.
+    """
+    key = f'{file_fingerprint(boundary_file)}_{tolerance}_{precision}'
+    path = os.path.join(CACHE_DIR, f'{key}.geojson')
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    with open(boundary_file, 'r', encoding='utf-8') as f:
+        geojson_data = json.load(f)
+    collection = {'type': 'FeatureCollection',
+                  'features': simplify_features(district_features(geojson_data), tolerance, precision)}
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(collection, f, ensure_ascii=False, separators=(',', ':'))
+    return collection
+
+
+def vertex_count(features):
+    return sum(int(shapely.get_num_coordinates(shape(feature['geometry']))) for feature in features)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simplify and cache the district boundaries.')
+    parser.add_argument('--boundary-file', default='hcm.geojson')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--precision', type=int, default=PRECISION)
+    args = parser.parse_args()
+
+    with open(args.boundary_file, 'r', encoding='utf-8') as f:
+        original = district_features(json.load(f))
+    simplified = simplified_boundaries(args.boundary_file, args.tolerance, args.precision)['features']
+
+    print(f"{len(simplified)} districts: {vertex_count(original)} -> {vertex_count(simplified)} vertices, "
+          f"{len(json.dumps(original))} -> {len(json.dumps(simplified, ensure_ascii=False, separators=(',', ':')))} bytes")
@@ -0,0 +1,107 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.spatial import cKDTree
+
+from distance_matrix import R
+
+
+def unit_sphere(lat, lon):
+    """3D points on the unit sphere, where chord length grows with great-circle distance."""
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def all_pairs(n_people, n_poi):
+    """Every (People, POI) pair, in row-major order of the dense matrices."""
+    rows, cols = np.divmod(np.arange(n_people * n_poi), n_poi)
+    return rows, cols
+
+
+def poi_sum_matrix(cols, n_poi):
+    """Sparse (POI, pairs) 0/1 matrix that sums pair variables per POI."""
+    n_pairs = len(cols)
+    return sp.csr_matrix((np.ones(n_pairs), (cols, np.arange(n_pairs))), shape=(n_poi, n_pairs))
+
+
+def pair_values(values, pairs, shape):
+    """Scatter the solution of the pair variables back to a dense (People, POI) matrix."""
+    rows, cols = pairs
+    dense = np.zeros(shape)
+    dense[rows, cols] = values
+    return dense
+
+
+def candidate_pairs(People_group, POI_group, k_nearest=None, radius_km=None, dist=None):
+    """
+    Candidate (People, POI) pairs of a unit, found with a KD-tree.
+
+    A pair is kept when the POI is one of the k_nearest POIs of the People
+    node, or lies within radius_km of it. The nearest People node of every
+    POI is always kept as well: the optimal model assigns all chargers of a
+    POI to a single People node, and that node is the nearest one, so the
+    pruned model keeps the full model's optimum while every POI stays usable.
+
+    Nearness is the straight-line distance unless dist, the (People, POI)
+    distance matrix the model is priced on (e.g. road distances), is given:
+    the pairs are then picked on dist itself, which the optimum argument
+    needs when it is not the haversine distance.
+
+    Returns (rows, cols) index arrays sorted in row-major order, or None
+    (every pair) when neither k_nearest nor radius_km is given.
+    """
+    if k_nearest is None and radius_km is None:
+        return None
+    if dist is not None:
+        return matrix_candidate_pairs(np.asarray(dist, dtype=float), k_nearest=k_nearest, radius_km=radius_km)
+
+    people_xyz = unit_sphere(People_group['Lat2'], People_group['Lon2'])
+    poi_xyz = unit_sphere(POI_group['Lat1'], POI_group['Lon1'])
+    n_people, n_poi = len(people_xyz), len(poi_xyz)
+    keep = np.zeros((n_people, n_poi), dtype=bool)
+
+    poi_tree = cKDTree(poi_xyz)
+    if k_nearest is not None:
+        k = min(k_nearest, n_poi)
+        _, nearest = poi_tree.query(people_xyz, k=k)
+        keep[np.repeat(np.arange(n_people), k), np.reshape(nearest, -1)] = True
+    if radius_km is not None:
+        chord = 2 * np.sin(min(radius_km / R, np.pi) / 2)
+        for j, nearby in enumerate(poi_tree.query_ball_point(people_xyz, chord)):
+            keep[j, nearby] = True
+
+    # Nearest People node of every POI
+    _, nearest_person = cKDTree(people_xyz).query(poi_xyz, k=1)
+    keep[nearest_person, np.arange(n_poi)] = True
+
+    return np.nonzero(keep)
+
+
+def matrix_candidate_pairs(dist, k_nearest=None, radius_km=None):
+    """candidate_pairs() picked on a dense (People, POI) distance matrix instead of the straight line."""
+    n_people, n_poi = dist.shape
+    keep = np.zeros((n_people, n_poi), dtype=bool)
+    if k_nearest is not None:
+        k = min(k_nearest, n_poi)
+        nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        keep[np.repeat(np.arange(n_people), k), np.reshape(nearest, -1)] = True
+    if radius_km is not None:
+        keep |= dist <= radius_km
+
+    # Nearest People node of every POI
+    keep[dist.argmin(axis=0), np.arange(n_poi)] = True
+
+    return np.nonzero(keep)
+
+
+def pruning_report(pairs, n_people, n_poi, formulation='pair'):
+    """Number of candidate pairs and of decision variables removed by pruning."""
+    n_full = n_people * n_poi
+    n_kept = n_full if pairs is None else len(pairs[0])
+    vars_per_pair = 3 if formulation == 'pair' else 2
+    return {
+        'pairs': n_kept,
+        'full_pairs': n_full,
+        'pruned_pairs': n_full - n_kept,
+        'pruned_variables': vars_per_pair * (n_full - n_kept),
+    }
@@ -0,0 +1,114 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from profiler import stage
+from results import read_sparse_results
+
+
+OUTPUT_COLUMNS = ['Unit', 'Type', 'Value', 'Column', 'Row', 'x coordinate', 'y coordinate']
+
+
+def read_visualize_matrices(file_path):
+    """
+    x2 and x3 matrices (People x POI) and the POI coordinates of an
+    input_visualize/<unit>.csv file: row 0 holds the POI latitudes, the
+    'x2 values' and 'x3 values' marker rows hold the POI longitudes and
+    the data rows start with the person latitude and longitude.
+    """
+    data = pd.read_csv(file_path, header=None, sep=",", on_bad_lines='skip', low_memory=False)
+    markers = data[1].to_numpy()
+    x2_row_idx = np.flatnonzero(markers == 'x2 values')[0]
+    x3_row_idx = np.flatnonzero(markers == 'x3 values')[0]
+
+    values = data.iloc[:, 2:]
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in values.dtypes):
+        values = values.apply(pd.to_numeric, errors='coerce')  # Non-numeric cells become NaN and are skipped
+    values = values.to_numpy(dtype=float)
+    return {
+        'x2': values[x2_row_idx + 1:x3_row_idx],
+        'x3': values[x3_row_idx + 1:],
+        'x_coordinates': values[0],
+        'y_coordinates': values[x2_row_idx],
+    }
+
+
+def nonzero_entries(unit, matrices, low=1, high=6):
+    """Output rows of every x2/x3 cell with low <= value <= high, sorted by POI (Column)."""
+    frames = []
+    for label, key in (('x2 value', 'x2'), ('x3 value', 'x3')):
+        matrix = matrices[key]
+        rows, cols = np.nonzero((matrix >= low) & (matrix <= high))
+        frames.append(pd.DataFrame({
+            'Type': label,
+            'Value': matrix[rows, cols],
+            'Column': cols,
+            'Row': rows,
+            'x coordinate': matrices['x_coordinates'][cols],
+            'y coordinate': matrices['y_coordinates'][cols],
+        }))
+
+    output_df = pd.concat(frames, ignore_index=True)
+    output_df.insert(0, 'Unit', unit)
+    return output_df.sort_values(by='Column', kind='stable')
+
+
+def sparse_entries(unit, result_file_path):
+    """Output rows of a sparse results_unit_*.parquet file (coordinates are already stored in it)."""
+    entries, _ = read_sparse_results(result_file_path)
+    output_df = pd.DataFrame({
+        'Unit': unit,
+        'Type': entries['Type'].astype(str),
+        'Value': entries['Value'].astype(float),
+        'Column': entries['Column'],
+        'Row': entries['Row'],
+        'x coordinate': entries['Lat1'],
+        'y coordinate': entries['Lon1'],
+    })
+    return output_df.sort_values(by='Column', kind='stable')
+
+
+def unit_output(unit, input_dir='input_visualize', result_dir='result_x2_x3', output_dir='output_visualize',
+                prefer_results=False):
+    """
+    Nonzero x2/x3 entries of one unit with their POI coordinates, read from
+    input_visualize/<unit>.csv or, when missing (or with prefer_results),
+    from the sparse result of the solver, and saved to
+    output_visualize/Output_<unit>.csv. Returns None (after printing the
+    error) when the unit cannot be processed.
+    """
+    file_path = f'{input_dir}/{unit}.csv'
+    sparse_path = f'{result_dir}/results_unit_{unit}.parquet'
+    try:
+        use_sparse = os.path.exists(sparse_path) and (prefer_results or not os.path.exists(file_path))
+        if not use_sparse:
+            output_df = nonzero_entries(unit, read_visualize_matrices(file_path))
+        else:
+            file_path = sparse_path
+            output_df = sparse_entries(unit, sparse_path)
+
+        output_file_path = f"{output_dir}/Output_{unit}.csv"
+        output_df.to_csv(output_file_path, index=False)
+        print(f"Results saved to {output_file_path}")
+        return output_df
+    except Exception as e:
+        print(f"Error processing {file_path}: {e}")
+        return None
+
+
+def combine_units(units, workers=None, input_dir='input_visualize', result_dir='result_x2_x3', output_dir='output_visualize'):
+    """Process every unit across a process pool and concatenate the results once, in unit order."""
+    start = time.perf_counter()
+    # Matrix parsing runs in the worker processes, so the profiler only sees the whole pool
+    with stage('parse matrices'), ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(unit_output, unit, input_dir, result_dir, output_dir) for unit in units]
+        outputs = [future.result() for future in futures]
+
+    with stage('concatenate'):
+        frames = [output_df for output_df in outputs if output_df is not None]
+        combined_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=OUTPUT_COLUMNS)
+    print(f"Processed {len(frames)} of {len(outputs)} units in {time.perf_counter() - start:.2f} seconds")
+    return combined_df
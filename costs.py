@@ -0,0 +1,27 @@
+# Cost and constraint coefficients of the charging-station model
+DEFAULT_COSTS = {
+    'land_divisor': 14_600,      # Land_Cost is spread over 14,600 days
+    'fixed_x2': 439_621,         # Fixed cost per x2 charger
+    'fixed_x3': 2_173_018,       # Fixed cost per x3 charger
+    'transport_x2': 38_868,      # Transportation cost per x2 charger and km
+    'transport_x3': 212_005,     # Transportation cost per x3 charger and km
+    'capex_x2': 21_349,          # Daily budget used by one x2 charger
+    'capex_x3': 90_784,          # Daily budget used by one x3 charger
+    'budget_days': 3650,         # Budget is spread over 3,650 days
+    'capacity_x2': 52.8,         # Demand served by one x2 charger
+    'capacity_x3': 288,          # Demand served by one x3 charger
+    'site_cap': 6,               # Maximum chargers of each type per POI
+}
+
+# Assumptions of draft code/iteration.py (its Slot bound is not part of the model)
+ITERATION_COSTS = {
+    **DEFAULT_COSTS,
+    'fixed_x2': 362_359,
+    'fixed_x3': 1_751_600,
+    'transport_x2': 4_871,
+    'transport_x3': 26_571,
+    'capacity_x2': 224.4 * 0.2,
+    'capacity_x3': 1_224 * 0.2,
+}
+
+COST_PRESETS = {'main': DEFAULT_COSTS, 'iteration': ITERATION_COSTS}
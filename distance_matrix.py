@@ -0,0 +1,88 @@
+import math
+import os
+
+import numpy as np
+
+from inputs import atomic_write, file_fingerprint, load_table, unit_rows
+
+
+# Earth's radius in kilometers for the Haversine formula
+R = 6371.0
+
+# Folder where the per-unit distance matrices are stored
+CACHE_DIR = 'cache/distance'
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Calculate the great-circle distance between two points on the Earth
+    using the Haversine formula (scalar reference version).
+    """
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2)**2
+    return 2 * R * math.asin(math.sqrt(a))
+
+
+def haversine_matrix(people_lat, people_lon, poi_lat, poi_lon):
+    """
+    Broadcast Haversine distance (km) between every People node (rows) and
+    every POI (columns), i.e. the same (People, POI) layout as x2/x3/b.
+    """
+    lat2 = np.radians(np.asarray(people_lat, dtype=float))[:, None]
+    lon2 = np.radians(np.asarray(people_lon, dtype=float))[:, None]
+    lat1 = np.radians(np.asarray(poi_lat, dtype=float))[None, :]
+    lon1 = np.radians(np.asarray(poi_lon, dtype=float))[None, :]
+
+    a = np.sin((lat2 - lat1) / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    return 2 * R * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def cache_folder(poi_path='POI.csv', people_path='PEOPLE_OLD.csv'):
+    return os.path.join(CACHE_DIR, file_fingerprint(poi_path, people_path))
+
+
+def build_distance_cache(poi_path='POI.csv', people_path='PEOPLE_OLD.csv'):
+    """
+    Compute the distance matrix of every unit in one pass and save each one
+    as '<unit>.npy' inside a folder keyed by the hash of both input files.
+    Units that are already cached are not recomputed.
+    """
+    folder = cache_folder(poi_path, people_path)
+    os.makedirs(folder, exist_ok=True)
+
+    POI_df = load_table(poi_path, 'POI')
+    People_df = load_table(people_path, 'People')
+
+    for unit_name, POI_group in POI_df.groupby('Unit', sort=False, observed=True):
+        path = os.path.join(folder, f'{unit_name}.npy')
+        if os.path.exists(path):
+            continue
+        People_group = unit_rows(People_df, unit_name)
+        dist = haversine_matrix(People_group['Lat2'], People_group['Lon2'], POI_group['Lat1'], POI_group['Lon1'])
+        with atomic_write(path) as f:
+            np.save(f, dist)
+
+    return folder
+
+
+def unit_distance_matrix(unit_name, poi_path='POI.csv', people_path='PEOPLE_OLD.csv', road_graph=None):
+    """
+    Return the (People, POI) distance matrix of a unit as a read-only memmap,
+    building the cache first if these input files were never seen before.
+    With road_graph (the path of a local OSM extract) the road-network
+    distances of road_network.py are returned instead of the haversine ones.
+    """
+    if road_graph is not None:
+        from road_network import unit_road_distance_matrix
+        return unit_road_distance_matrix(unit_name, road_graph, poi_path, people_path)
+
+    path = os.path.join(cache_folder(poi_path, people_path), f'{unit_name}.npy')
+    if not os.path.exists(path):
+        build_distance_cache(poi_path, people_path)
+    return np.load(path, mmap_mode='r')
+
+
+if __name__ == '__main__':
+    folder = build_distance_cache()
+    print(f"Distance matrices cached in {folder}")
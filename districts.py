@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import shape
+
+from boundaries import district_features
+from inputs import file_fingerprint, load_table
+
+
+# Folder where the district of every row of an input file is stored
+CACHE_DIR = 'cache/districts'
+
+# Latitude and longitude columns of every input table
+COORDINATES = {
+    'POI': ('Lat1', 'Lon1'),
+    'People': ('Lat2', 'Lon2'),
+    'Existing': ('x coordinate', 'y coordinate'),
+}
+
+
+def district_polygons(boundary_file='hcm.geojson'):
+    """District names and full-precision polygons of the boundary file."""
+    with open(boundary_file, 'r', encoding='utf-8') as f:
+        features = district_features(json.load(f))
+    names = np.array([feature['properties']['name'] for feature in features], dtype=object)
+    polygons = np.array([shape(feature['geometry']) for feature in features], dtype=object)
+    return names, polygons
+
+
+def assign_points(lat, lon, names, polygons):
+    """
+    District name of every (lat, lon) point, None outside every district
+    or without coordinates. The candidate polygons of all points come from
+    one vectorized STRtree query; a point on a shared border goes to the
+    first district it touches.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    valid = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+
+    tree = shapely.STRtree(polygons)
+    point_index, polygon_index = tree.query(shapely.points(lon[valid], lat[valid]), predicate='intersects')
+    point_index, first = np.unique(point_index, return_index=True)
+
+    assigned = np.full(len(lat), None, dtype=object)
+    assigned[valid[point_index]] = names[polygon_index[first]]
+    return assigned
+
+
+def assign_districts(path, kind, boundary_file='hcm.geojson'):
+    """
+    District of every row of an input table (aligned with load_table(path,
+    kind)), cached by the hashes of the input and boundary files.
+    """
+    key = f'{os.path.basename(path)}.{file_fingerprint(path, boundary_file)}'
+    cache_path = os.path.join(CACHE_DIR, f'{key}.parquet')
+    if os.path.exists(cache_path):
+        return pd.read_parquet(cache_path)['District']
+
+    df = load_table(path, kind)
+    lat_column, lon_column = COORDINATES[kind]
+    districts = pd.Series(assign_points(df[lat_column], df[lon_column], *district_polygons(boundary_file)),
+                          index=df.index, name='District', dtype='string')
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    districts.to_frame().to_parquet(cache_path)
+    return districts
+
+
+def label_report(units, districts):
+    """
+    Text Unit label against the point-in-polygon district, per label: the
+    district most of its rows fall in, and how many rows are in it, in
+    another district or outside every district.
+    """
+    rows = []
+    frame = pd.DataFrame({'Unit': units.astype('string'), 'District': districts.astype('string')})
+    for unit, group in frame.dropna(subset=['Unit']).groupby('Unit', sort=False):
+        counts = group['District'].value_counts()
+        district = counts.index[0] if len(counts) else None
+        matching = int(counts.iloc[0]) if len(counts) else 0
+        outside = int(group['District'].isna().sum())
+        rows.append({'Unit': unit, 'District': district, 'Same name': unit == district, 'Rows': len(group),
+                     'In district': matching, 'In other districts': len(group) - matching - outside, 'Outside': outside})
+    return pd.DataFrame(rows)
+
+
+def print_mismatches(path, report):
+    """Labels named differently from their district and rows outside the district of their label."""
+    for row in report.to_dict('records'):
+        if not row['Same name']:
+            print(f"{path}: label '{row['Unit']}' matches district '{row['District']}' "
+                  f"({row['In district']} of {row['Rows']} rows)")
+        if row['In other districts'] or row['Outside']:
+            print(f"{path}: '{row['Unit']}' has {row['In other districts']} rows in other districts "
+                  f"and {row['Outside']} outside every district")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Assign every input row to a district by point-in-polygon.')
+    parser.add_argument('--boundary-file', default='hcm.geojson')
+    parser.add_argument('--poi', nargs='+', default=['POI.csv', 'POI4.csv'])
+    parser.add_argument('--people', nargs='+', default=['PEOPLE_OLD.csv', 'PEOPLE.csv'])
+    parser.add_argument('--existing', default='EXISTING.csv')
+    args = parser.parse_args()
+
+    paths = [(path, 'POI') for path in args.poi] + [(path, 'People') for path in args.people] + [(args.existing, 'Existing')]
+    for path, kind in paths:
+        start = time.perf_counter()
+        districts = assign_districts(path, kind, args.boundary_file)
+        elapsed = time.perf_counter() - start
+
+        report = label_report(load_table(path, kind)['Unit'], districts)
+        print(f"{path}: {len(districts)} rows assigned in {elapsed * 1000:.1f} ms, "
+              f"{int(districts.isna().sum())} outside every district")
+        print_mismatches(path, report)
@@ -0,0 +1,158 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from costs import DEFAULT_COSTS
+from distance_matrix import unit_distance_matrix
+from inputs import load_inputs, unit_data
+from results import read_result_matrices, result_file
+
+
+# Objective terms and constraints reported by evaluate()
+COMPONENTS = ['land', 'fixed', 'transport']
+CONSTRAINTS = ['budget', 'demand', 'site_cap', 'integrality', 'indicator']
+
+
+def evaluate(x2, x3, land_cost, dist, Budget, Demand, costs=None, b=None, tol=1e-6):
+    """
+    Objective terms and constraint violations of one or many placements of
+    a unit, in one vectorized pass.
+
+    x2 and x3 are (People, POI) charger counts or batches of them with any
+    leading dimensions (..., People, POI). b defaults to the pairs with at
+    least one charger, which is what the indicator constraints force. The
+    terms are those of model_builder.build_model, including the products
+    with b summed per POI. Violations are the amount by which each
+    constraint is broken (0 when satisfied): Budget and Demand totals,
+    chargers above site_cap per POI, distance to the nearest non-negative
+    integer and the number of pairs whose b disagrees with x2 + x3.
+
+    Returns a dict of arrays of the batch shape: land, fixed, transport,
+    objective, the violations and feasible.
+    """
+    costs = {**DEFAULT_COSTS, **(costs or {})}
+    x2 = np.asarray(x2, dtype=float)
+    x3 = np.asarray(x3, dtype=float)
+    dist = np.asarray(dist, dtype=float)
+    land_coef = np.asarray(land_cost, dtype=float) / costs['land_divisor']
+    b = (x2 + x3 > 0.5).astype(float) if b is None else np.broadcast_to(np.asarray(b, dtype=float), x2.shape)
+
+    # Sums per POI
+    x2_poi = x2.sum(axis=-2)
+    x3_poi = x3.sum(axis=-2)
+    b_poi = b.sum(axis=-2)
+
+    result = {
+        'land': ((x2_poi + x3_poi) * b_poi) @ land_coef,
+        'fixed': (costs['fixed_x2'] * x2_poi * b_poi + costs['fixed_x3'] * x3_poi * b_poi).sum(axis=-1),
+        'transport': np.einsum('...ij,ij->...', (costs['transport_x2'] * x2 + costs['transport_x3'] * x3) * b, dist),
+    }
+    result['objective'] = result['land'] + result['fixed'] + result['transport']
+
+    x2_total = x2_poi.sum(axis=-1)
+    x3_total = x3_poi.sum(axis=-1)
+    used = x2 + x3
+    result['budget'] = np.maximum(costs['capex_x2'] * x2_total + costs['capex_x3'] * x3_total - Budget / costs['budget_days'], 0.0)
+    result['demand'] = np.maximum(Demand - (costs['capacity_x2'] * x2_total + costs['capacity_x3'] * x3_total), 0.0)
+    result['site_cap'] = (np.maximum(x2_poi - costs['site_cap'], 0.0) + np.maximum(x3_poi - costs['site_cap'], 0.0)).sum(axis=-1)
+    result['integrality'] = (np.abs(x2 - np.round(x2)) + np.abs(x3 - np.round(x3))
+                             + np.maximum(-x2, 0.0) + np.maximum(-x3, 0.0)).sum(axis=(-2, -1))
+    result['indicator'] = (((b < 0.5) & (used > tol)) | ((b > 0.5) & (used < 1 - tol))).sum(axis=(-2, -1))
+    # Budget and demand are compared on their own scale, the per-POI and per-pair constraints in absolute units
+    tolerance = {'budget': tol * max(1.0, Budget / costs['budget_days']), 'demand': tol * max(1.0, Demand),
+                 'site_cap': tol, 'integrality': tol, 'indicator': tol}
+    result['feasible'] = np.all([result[name] <= tolerance[name] for name in CONSTRAINTS], axis=0)
+    return result
+
+
+def evaluate_unit(unit_name, x2, x3, b=None, inputs=None, costs=None, road_graph=None,
+                  poi_path='POI.csv', people_path='PEOPLE_OLD.csv'):
+    """evaluate() with the Land_Cost, distances, Budget and Demand of a unit."""
+    if inputs is None:
+        inputs = load_inputs(poi_path, people_path)
+    POI_group, People_group, Budget, Demand, Slot = unit_data(unit_name, *inputs)
+    dist = unit_distance_matrix(unit_name, poi_path, people_path, road_graph=road_graph)
+    return evaluate(x2, x3, POI_group['Land_Cost'], dist, Budget, Demand, costs=costs, b=b)
+
+
+def check_stored_results(units, result_dir='result_x2_x3', poi_paths=('POI.csv', 'POI4.csv'), people_path='PEOPLE_OLD.csv',
+                         constraint_path='CONSTRAINT.csv', rtol=1e-6):
+    """
+    Stored objective of every unit's result file against the one
+    recomputed from its x2/x3 (and b) values. Each result is evaluated on
+    the first candidate POI file whose (People, POI) shape it matches; a
+    result matching none was solved on inputs that changed since.
+    """
+    input_sets = {poi_path: load_inputs(poi_path, people_path, constraint_path) for poi_path in poi_paths}
+    rows = []
+    for unit in units:
+        path = result_file(unit, result_dir)
+        if path is None:
+            continue
+        matrices = read_result_matrices(path)
+        row = {'Unit': unit, 'Stored objective': matrices['optimal_solution'], 'Inputs': None}
+        for poi_path, inputs in input_sets.items():
+            POI_group, People_group = unit_data(unit, *inputs)[:2]
+            if matrices['x2_values'].shape != (len(People_group), len(POI_group)):
+                continue
+            evaluation = evaluate_unit(unit, matrices['x2_values'], matrices['x3_values'], b=matrices['b_values'],
+                                       inputs=inputs, poi_path=poi_path, people_path=people_path)
+            stored = matrices['optimal_solution']
+            row.update({
+                'Inputs': poi_path,
+                'Recomputed objective': float(evaluation['objective']),
+                **{name.capitalize(): float(evaluation[name]) for name in COMPONENTS},
+                'Relative difference': abs(float(evaluation['objective']) - stored) / max(abs(stored), 1.0),
+                'Feasible': bool(evaluation['feasible']),
+                'Violations': ', '.join(name for name in CONSTRAINTS if evaluation[name] > 0),
+            })
+            break
+        else:
+            row['Violations'] = f"shape {matrices['x2_values'].shape} matches no input file"
+        rows.append(row)
+
+    report = pd.DataFrame(rows)
+    report['Match'] = report['Relative difference'] <= rtol
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recompute the objective of every stored result with the NumPy evaluator.')
+    parser.add_argument('--result-dir', default='result_x2_x3')
+    parser.add_argument('--batch', type=int, default=1000,
+                        help='Also time a batch of this many random one-charger moves of the first unit')
+    args = parser.parse_args()
+
+    units = pd.read_csv('Unit.csv')['Unit']
+
+    start = time.perf_counter()
+    report = check_stored_results(units, args.result_dir)
+    elapsed = time.perf_counter() - start
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(report[['Unit', 'Inputs', 'Stored objective', 'Recomputed objective', 'Relative difference', 'Feasible',
+                      'Violations']].to_string(index=False))
+    print(f"{int(report['Match'].sum())} of {len(report)} stored objectives match, "
+          f"{int((report['Feasible'] == True).sum())} placements feasible ({elapsed:.3f} seconds)")
+
+    # Batched scoring: move one x3 charger of the stored placement to a random pair, for many placements at once
+    evaluated = report.dropna(subset=['Inputs'])
+    if args.batch and len(evaluated):
+        unit, poi_path, current = evaluated[['Unit', 'Inputs', 'Recomputed objective']].iloc[0]
+        matrices = read_result_matrices(result_file(unit, args.result_dir))
+        rng = np.random.default_rng(0)
+        x3 = np.repeat(matrices['x3_values'][None], args.batch, axis=0)
+        used = np.argwhere(matrices['x3_values'] > 0.5)
+        batch = np.arange(args.batch)
+        source = used[rng.integers(len(used), size=args.batch)]
+        x3[batch, source[:, 0], source[:, 1]] -= 1
+        x3[batch, rng.integers(x3.shape[1], size=args.batch), rng.integers(x3.shape[2], size=args.batch)] += 1
+
+        start = time.perf_counter()
+        evaluation = evaluate_unit(unit, matrices['x2_values'], x3, poi_path=poi_path)
+        elapsed = time.perf_counter() - start
+        feasible = evaluation['feasible']
+        best = f"best {evaluation['objective'][feasible].min():.2f}" if feasible.any() else 'none'
+        print(f"{unit}: {args.batch} moved placements scored in {elapsed * 1000:.1f} ms, "
+              f"{int(feasible.sum())} feasible, {best} vs {current:.2f} for the stored placement")
@@ -0,0 +1,234 @@
+import argparse
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from costs import DEFAULT_COSTS
+from distance_matrix import unit_distance_matrix
+from inputs import load_inputs, unit_data
+from results import write_results
+
+
+def site_unit_costs(POI_group, dist, costs):
+    """
+    Cost of one x2 and one x3 charger on every POI.
+
+    In an optimal placement all chargers of a POI serve its nearest People
+    node (b.sum(axis=0) == 1), so each charger adds its land, fixed and
+    transportation cost independently of the others.
+    """
+    dist = np.asarray(dist, dtype=float)
+    nearest = np.argmin(dist, axis=0)  # Nearest People node of every POI
+    dist_min = dist[nearest, np.arange(dist.shape[1])]
+    land_coef = POI_group['Land_Cost'].to_numpy(dtype=float) / costs['land_divisor']
+
+    c2 = land_coef + costs['fixed_x2'] + costs['transport_x2'] * dist_min
+    c3 = land_coef + costs['fixed_x3'] + costs['transport_x3'] * dist_min
+    return c2, c3, nearest
+
+
+def cheapest_free(c, y, cap, m):
+    """Sites (with repetition) of the m cheapest free charger slots, and their total cost."""
+    order = np.argsort(c, kind='stable')
+    slots = np.repeat(order, (cap - y)[order])[:m]
+    return slots, c[slots].sum()
+
+
+def priciest_used(c, y, m):
+    """Sites (with repetition) of the m most expensive used chargers, and their total cost."""
+    order = np.argsort(-c, kind='stable')
+    slots = np.repeat(order, y[order])[:m]
+    return slots, c[slots].sum()
+
+
+class Placement:
+    """Charger counts per POI with running totals, so every move is priced incrementally."""
+
+    def __init__(self, c2, c3, costs, Budget, Demand):
+        self.c = {'x2': c2, 'x3': c3}
+        self.y = {'x2': np.zeros(len(c2), dtype=int), 'x3': np.zeros(len(c3), dtype=int)}
+        self.capex = {'x2': costs['capex_x2'], 'x3': costs['capex_x3']}
+        self.capacity = {'x2': costs['capacity_x2'], 'x3': costs['capacity_x3']}
+        self.cap = int(costs['site_cap'])
+        self.budget = Budget / costs['budget_days']
+        self.demand = Demand
+        self.cost = 0.0
+        self.spent = 0.0
+        self.served = 0.0
+
+    def delta(self, kind, sites, sign):
+        """Cost, budget and served-demand change of adding (+1) or dropping (-1) chargers."""
+        n = len(sites)
+        return sign * self.c[kind][sites].sum(), sign * n * self.capex[kind], sign * n * self.capacity[kind]
+
+    def feasible_after(self, spent, served):
+        return self.spent + spent <= self.budget + 1e-6 and self.served + served >= self.demand - 1e-6
+
+    def apply(self, kind, sites, sign):
+        d_cost, d_spent, d_served = self.delta(kind, sites, sign)
+        np.add.at(self.y[kind], sites, sign)
+        self.cost += d_cost
+        self.spent += d_spent
+        self.served += d_served
+
+    @property
+    def feasible(self):
+        return self.feasible_after(0.0, 0.0)
+
+
+def greedy(placement):
+    """Add the charger with the lowest cost per unit of demand until Demand is met within Budget."""
+    p = placement
+    slots = [(p.c[kind][i] / p.capacity[kind], kind, i) for kind in ('x2', 'x3') for i in range(len(p.c[kind]))]
+    for _, kind, i in sorted(slots):
+        while p.y[kind][i] < p.cap and p.served < p.demand:
+            if p.spent + p.capex[kind] > p.budget + 1e-6:
+                break
+            p.apply(kind, np.array([i]), +1)
+        if p.served >= p.demand:
+            break
+
+    # Fall back to the most budget-efficient charger type if Budget ran out first
+    if p.served < p.demand:
+        kind = min(('x2', 'x3'), key=lambda k: p.capex[k] / p.capacity[k])
+        while p.served < p.demand:
+            sites, _ = cheapest_free(p.c[kind], p.y[kind], p.cap, 1)
+            if len(sites) == 0 or p.spent + p.capex[kind] > p.budget + 1e-6:
+                break
+            p.apply(kind, sites, +1)
+    return p
+
+
+def improve(placement, max_moves=100_000):
+    """
+    Local search with swap, drop and add/drop moves, accepting the first
+    improving feasible move until none is left:
+    - swap: move one charger to the cheapest free slot of the same type;
+    - drop: remove the most expensive charger if Demand stays met;
+    - exchange: drop the most expensive chargers of one type and add the
+      fewest cheapest chargers of the other type that keep Demand met.
+    """
+    p = placement
+    for _ in range(max_moves):
+        moved = False
+
+        for kind in ('x2', 'x3'):
+            # Swap within a type
+            used, used_cost = priciest_used(p.c[kind], p.y[kind], 1)
+            free, free_cost = cheapest_free(p.c[kind], p.y[kind], p.cap, 1)
+            if len(used) and len(free) and free_cost < used_cost - 1e-9:
+                p.apply(kind, used, -1)
+                p.apply(kind, free, +1)
+                moved = True
+                continue
+
+            # Drop
+            if len(used):
+                _, d_spent, d_served = p.delta(kind, used, -1)
+                if p.feasible_after(d_spent, d_served):
+                    p.apply(kind, used, -1)
+                    moved = True
+                    continue
+
+        for drop_kind, add_kind in (('x3', 'x2'), ('x2', 'x3')):
+            # Exchange: drop n chargers of one type for the fewest chargers of the other type
+            for n_drop in range(1, int(math.ceil(p.capacity[add_kind] / p.capacity[drop_kind])) + 1):
+                dropped, _ = priciest_used(p.c[drop_kind], p.y[drop_kind], n_drop)
+                if len(dropped) < n_drop:
+                    break
+                drop_cost, drop_spent, drop_served = p.delta(drop_kind, dropped, -1)
+                deficit = p.demand - (p.served + drop_served)
+                n_add = max(0, int(math.ceil(deficit / p.capacity[add_kind] - 1e-9)))
+                added, _ = cheapest_free(p.c[add_kind], p.y[add_kind], p.cap, n_add)
+                if len(added) < n_add:
+                    continue
+                add_cost, add_spent, add_served = p.delta(add_kind, added, +1)
+                if drop_cost + add_cost < -1e-9 and p.feasible_after(drop_spent + add_spent, drop_served + add_served):
+                    p.apply(drop_kind, dropped, -1)
+                    p.apply(add_kind, added, +1)
+                    moved = True
+                    break
+
+        if not moved:
+            break
+    return p
+
+
+def solve_unit_heuristic(unit_name, inputs=None, poi_path='POI.csv', people_path='PEOPLE_OLD.csv', costs=None,
+                         road_graph=None):
+    """
+    Greedy placement improved by local search for one unit.
+
+    Returns the same result dict as solver.solve_unit, with every charger of
+    a POI assigned to its nearest People node. road_graph prices it on road
+    distances, as in solver.solve_unit.
+    """
+    costs = {**DEFAULT_COSTS, **(costs or {})}
+    if inputs is None:
+        inputs = load_inputs(poi_path, people_path)
+    POI_group, People_group, Budget, Demand, Slot = unit_data(unit_name, *inputs)
+    dist_matrix = unit_distance_matrix(unit_name, poi_path, people_path, road_graph=road_graph)
+
+    start = time.perf_counter()
+    c2, c3, nearest = site_unit_costs(POI_group, dist_matrix, costs)
+    placement = greedy(Placement(c2, c3, costs, Budget, Demand))
+    greedy_cost = placement.cost
+    placement = improve(placement)
+    solve_time = time.perf_counter() - start
+
+    # Assign every charger of a POI to its nearest People node
+    x2_values = np.zeros(dist_matrix.shape)
+    x3_values = np.zeros(dist_matrix.shape)
+    poi_index = np.arange(dist_matrix.shape[1])
+    x2_values[nearest, poi_index] = placement.y['x2']
+    x3_values[nearest, poi_index] = placement.y['x3']
+
+    return {
+        'unit': unit_name,
+        'formulation': 'heuristic',
+        'x2_values': x2_values,
+        'x3_values': x3_values,
+        'b_values': (x2_values + x3_values > 0).astype(float),
+        'optimal_solution': placement.cost,
+        'greedy_solution': greedy_cost,
+        'feasible': placement.feasible,
+        'poi_coordinates': POI_group[['Lat1', 'Lon1']].to_numpy(dtype=float),
+        'people_coordinates': People_group[['Lat2', 'Lon2']].to_numpy(dtype=float),
+        'build_time': 0.0,
+        'solve_time': solve_time,
+        'callback_data': [],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Greedy + local-search placement of every unit.')
+    parser.add_argument('--poi', default='POI.csv', help='Candidate POI file (e.g. POI4.csv)')
+    parser.add_argument('--unit', default=None, help='Single unit (default: every unit of Unit.csv)')
+    parser.add_argument('--output-dir', default='result_heuristic')
+    parser.add_argument('--road-graph', default=None, help='Price transportation on the road distances of this OSM extract')
+    parser.add_argument('--reference', choices=['gurobi', 'highs', 'none'], default='highs',
+                        help='Backend solving the MIP optimum the gap is reported against (none: skip the gap)')
+    args = parser.parse_args()
+
+    inputs = load_inputs(args.poi, 'PEOPLE_OLD.csv', 'CONSTRAINT.csv')
+    units = [args.unit] if args.unit else pd.read_csv('Unit.csv')['Unit']
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    for unit in units:
+        result = solve_unit_heuristic(unit, inputs=inputs, poi_path=args.poi, road_graph=args.road_graph)
+        write_results(result, result_dir=args.output_dir, data_dir=args.output_dir)
+
+        # Gap against the MIP optimum of the same candidates and distances, solved now
+        mip_objective = None
+        if args.reference != 'none':
+            from backends import solve_unit_with_backend
+            mip_objective = solve_unit_with_backend(unit, args.reference, inputs=inputs, poi_path=args.poi,
+                                                    road_graph=args.road_graph)['optimal_solution']
+        gap = ''
+        if mip_objective:
+            gap = f", gap to MIP: {(result['optimal_solution'] - mip_objective) / abs(mip_objective):.4%}"
+        print(f"{unit}: {result['optimal_solution']:.2f} (greedy {result['greedy_solution']:.2f}, "
+              f"feasible: {result['feasible']}) in {result['solve_time'] * 1000:.1f} ms{gap}")
@@ -0,0 +1,174 @@
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+
+# Folder where the validated input tables are stored
+STORE_DIR = 'cache/inputs'
+
+# Required columns of every input table, and the ones coerced to numbers
+SCHEMAS = {
+    'POI': {'columns': ['Lat1', 'Lon1', 'Land_Cost', 'Unit'], 'numeric': ['Lat1', 'Lon1', 'Land_Cost']},
+    'People': {'columns': ['Lat2', 'Lon2', 'Unit'], 'numeric': ['Lat2', 'Lon2']},
+    'Constraint': {'columns': ['Unit', 'Budget', 'Demand', 'Slot'], 'numeric': ['Budget', 'Demand', 'Slot']},
+    'Existing': {'columns': ['Unit', 'Name', 'Type', 'Value', 'x coordinate', 'y coordinate'],
+                 'numeric': ['Value', 'x coordinate', 'y coordinate']},
+}
+
+
+def file_fingerprint(*paths):
+    """Short sha256 of the raw bytes of the given input files."""
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+@contextmanager
+def atomic_write(path):
+    """
+    Binary file to write path through: the data goes to a temporary file
+    in the same folder, moved into place with os.replace once complete, so
+    concurrent readers (e.g. other workers of a process pool) never see a
+    partly written cache file.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.tmp_')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def ingest(path, kind):
+    """
+    Validate and coerce one input CSV once: check the required columns,
+    coerce the numeric ones (reporting the values that are not numbers),
+    make Unit categorical and sort the rows by Unit (stable, so the rows of
+    a unit keep their file order, rows without a Unit first). The per-unit
+    row offsets are kept in DataFrame.attrs.
+    """
+    schema = SCHEMAS[kind]
+    df = pd.read_csv(path)
+
+    missing = [column for column in schema['columns'] if column not in df.columns]
+    if missing:
+        raise ValueError(f"{path} is missing the {kind} columns {missing}")
+
+    for column in schema['numeric']:
+        values = pd.to_numeric(df[column], errors='coerce')
+        invalid = int((values.isna() & df[column].notna()).sum())
+        if invalid:
+            print(f"{path}: {invalid} non-numeric values in '{column}' set to NaN")
+        df[column] = values
+    if df['Unit'].isna().any():
+        print(f"{path}: {int(df['Unit'].isna().sum())} rows without a Unit")
+
+    # Categorical Unit (categories in order of first appearance) with the rows of each unit contiguous
+    df['Unit'] = pd.Categorical(df['Unit'], categories=df['Unit'].dropna().unique())
+    df = df.iloc[df['Unit'].cat.codes.argsort(kind='stable')]
+    df.attrs['unit_offsets'] = unit_offsets(df)
+    return df
+
+
+def unit_offsets(df):
+    """(start, stop) row range of every Unit category of a Unit-sorted table."""
+    codes = df['Unit'].cat.codes.to_numpy()
+    categories = np.arange(len(df['Unit'].cat.categories))
+    return np.column_stack([codes.searchsorted(categories, side='left'), codes.searchsorted(categories, side='right')])
+
+
+def store_file(path):
+    """Feather file of the store holding the current contents of a CSV."""
+    return os.path.join(STORE_DIR, f'{os.path.basename(path)}.{file_fingerprint(path)}.feather')
+
+
+def load_table(path, kind):
+    """
+    Input table from the store, ingesting the CSV the first time (or after
+    it changed): the stored Feather file is keyed by the CSV's hash.
+    """
+    store_path = store_file(path)
+    if os.path.exists(store_path):
+        table = feather.read_table(store_path)
+        df = table.to_pandas()
+        df.attrs['unit_offsets'] = np.array(json.loads(table.schema.metadata[b'unit_offsets']), dtype=int).reshape(-1, 2)
+        return df
+
+    df = ingest(path, kind)
+    os.makedirs(STORE_DIR, exist_ok=True)
+    stored = df.copy(deep=False)
+    stored.attrs = {}  # The offsets go to the schema metadata instead
+    table = pa.Table.from_pandas(stored)
+    table = table.replace_schema_metadata({**table.schema.metadata,
+                                           b'unit_offsets': json.dumps(df.attrs['unit_offsets'].tolist()).encode()})
+    with atomic_write(store_path) as f:
+        feather.write_feather(table, f, compression='uncompressed')
+    return df
+
+
+def unit_rows(df, unit_name):
+    """
+    Rows of one unit: a slice found by binary search on the Unit category
+    codes when df is sorted by its categorical Unit (as the stored tables
+    are), a boolean filter otherwise (e.g. after sort_values).
+    """
+    unit = df['Unit'].array
+    if isinstance(unit, pd.Categorical):
+        categories = unit.categories
+        codes = unit.codes
+        if unit_name in categories and (codes[1:] >= codes[:-1]).all():
+            code = categories.get_loc(unit_name)
+            return df.iloc[codes.searchsorted(code, side='left'):codes.searchsorted(code, side='right')]
+    return df[df['Unit'] == unit_name]
+
+
+def load_inputs(poi_path='POI.csv', people_path='PEOPLE_OLD.csv', constraint_path='CONSTRAINT.csv'):
+    """Load the validated POI, People and Constraint tables from the input store."""
+    POI_df = load_table(poi_path, 'POI')  # Columns: ['Lat1', 'Lon1', 'Land_Cost', 'Unit']
+    People_df = load_table(people_path, 'People')  # Columns: ['Lat2', 'Lon2', 'Unit']
+    Constraint_df = load_table(constraint_path, 'Constraint')  # Columns: ['Unit', 'Budget', 'Demand', 'Slot']
+    return POI_df, People_df, Constraint_df
+
+
+def load_existing(existing_path='EXISTING.csv'):
+    """Load the validated existing charging stations from the input store."""
+    return load_table(existing_path, 'Existing')
+
+
+def unit_data(unit_name, POI_df, People_df, Constraint_df):
+    """Slice the input tables for one unit."""
+    POI_group = unit_rows(POI_df, unit_name)
+    People_group = unit_rows(People_df, unit_name)
+    Constraint_group = unit_rows(Constraint_df, unit_name)
+
+    Budget = Constraint_group['Budget'].values[0]
+    Demand = Constraint_group['Demand'].values[0]
+    Slot = Constraint_group['Slot'].values[0]
+    return POI_group, People_group, Budget, Demand, Slot
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Validate the input CSV files and store them as typed Feather tables.')
+    parser.add_argument('--poi', nargs='+', default=['POI.csv', 'POI4.csv'])
+    parser.add_argument('--people', nargs='+', default=['PEOPLE_OLD.csv', 'PEOPLE.csv'])
+    parser.add_argument('--constraint', default='CONSTRAINT.csv')
+    parser.add_argument('--existing', default='EXISTING.csv')
+    args = parser.parse_args()
+
+    paths = [(path, 'POI') for path in args.poi] + [(path, 'People') for path in args.people]
+    paths += [(args.constraint, 'Constraint'), (args.existing, 'Existing')]
+    for path, kind in paths:
+        df = load_table(path, kind)
+        print(f"{path}: {len(df)} rows, {len(df.attrs['unit_offsets'])} units")
@@ -0,0 +1,293 @@
+import time
+from contextlib import contextmanager
+
+import folium
+import numpy as np
+import pandas as pd
+from folium.plugins import BeautifyIcon, FastMarkerCluster  # Import BeautifyIcon for custom markers
+
+from boundaries import simplified_boundaries
+from profiler import stage as profile_stage
+
+
+# Custom legend of the map
+LEGEND_HTML = '''
+<div style="position: fixed;
+            bottom: 50px; left: 50px;
+            background-color: white; z-index:9999; font-size:14px;
+            border:2px solid grey; padding: 10px; text-align: left; display: flex; flex-direction: column; justify-content: center; width: auto; height: auto;">
+    <b style="text-align: center; margin-bottom: 5px;">Note</b>
+    <div style="text-align: center;">
+        <i class="fa fa-bolt" style="color:red"></i> New charging station <br>
+        <i class="fa fa-bolt" style="color:blue"></i> Existing charging station <br>
+        <i class="fa fa-star" style="color:green"></i> House (Star Icon) <br>
+        <i style="color:#808080;">--- </i> Line to Charging Station (Gray) <br>
+    </div>
+</div>
+'''
+
+# Above this many station and house markers, render='auto' switches to clusters on a canvas
+CLUSTER_THRESHOLD = 2000
+
+# FastMarkerCluster callbacks: every row is a compact array and its popup is only built when opened
+STATION_CALLBACK = '''function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]),
+                                {radius: 1, color: '%s', fill: true, fillColor: '%s', fillOpacity: 1});
+    marker.bindPopup(function () {
+        var html = '';
+        row[2].forEach(function (field) { html += field[0] + ': ' + field[1] + '<br>'; });
+        html += 'X Coordinate: ' + row[0] + '<br>Y Coordinate: ' + row[1] + '<br><br>';
+        row[3].forEach(function (entry) { html += 'Type: ' + entry[0] + '<br>Value: ' + entry[1] + '<br><br>'; });
+        return html;
+    });
+    return marker;
+}'''
+
+HOUSE_CALLBACK = '''function (row) {
+    var icon = L.divIcon({html: '<i class="fa fa-star" style="color:green;font-size:10px;"></i>', className: '', iconSize: [10, 10]});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindPopup(function () {
+        return 'House in ' + row[2] + '<br>Latitude: ' + row[0] + '<br>Longitude: ' + row[1];
+    });
+    return marker;
+}'''
+
+
+@contextmanager
+def timed(stage, stage_times):
+    """Add the wall time of the block to stage_times[stage] (and record it as a profiler stage)."""
+    start = time.perf_counter()
+    with profile_stage(stage):
+        yield
+    stage_times[stage] = stage_times.get(stage, 0.0) + time.perf_counter() - start
+
+
+def style_function(feature):
+    """Color and borders of the district boundaries."""
+    return {
+        'fillColor': '#ffcccb',
+        'color': 'black',
+        'weight': 2,
+        'fillOpacity': 0.3
+    }
+
+
+def line_style(feature):
+    return {
+        'color': '#000000',  # Gray color
+        'weight': 0.1  # Thin line
+    }
+
+
+def station_index(stations):
+    """
+    {unit: (n, 2) array of distinct (lat, lon) station coordinates}, built
+    once so every lookup by unit is a dict access.
+    """
+    coordinates = stations[['Unit', 'x coordinate', 'y coordinate']].dropna().drop_duplicates()
+    return {str(unit): group[['x coordinate', 'y coordinate']].to_numpy(dtype=float)
+            for unit, group in coordinates.groupby('Unit', sort=False, observed=True)}
+
+
+def station_locations(stations, header_columns):
+    """
+    One row per distinct (x coordinate, y coordinate): the header_columns
+    of the first station there and the [Type, Value] Entries of all of them.
+    """
+    stations = stations.dropna(subset=['x coordinate', 'y coordinate'])
+    entries = pd.Series(list(zip(stations['Type'].astype(str), stations['Value'].astype(str))), index=stations.index)
+    grouped = stations.assign(Entries=entries).groupby(['x coordinate', 'y coordinate'], sort=True)
+
+    locations = grouped.first()[header_columns].reset_index()
+    locations['Entries'] = grouped['Entries'].agg(list).to_numpy()
+    return locations
+
+
+def station_popups(locations, header_columns):
+    """HTML popup of every station location of station_locations()."""
+    header = ''
+    for column in header_columns:
+        header += f'{column}: ' + locations[column].astype(str) + '<br>'
+    header += ('X Coordinate: ' + locations['x coordinate'].astype(str) +
+               '<br>Y Coordinate: ' + locations['y coordinate'].astype(str) + '<br><br>')
+    entries = [''.join(f'Type: {station_type}<br>Value: {value}<br><br>' for station_type, value in location_entries)
+               for location_entries in locations['Entries']]
+    return header + pd.Series(entries, index=locations.index, dtype=str)
+
+
+def add_boundaries(m, boundary_file):
+    """The simplified districts of the boundary file as one styled GeoJSON layer with a popup per district."""
+    folium.GeoJson(
+        simplified_boundaries(boundary_file),
+        name='Districts',
+        style_function=style_function,
+        popup=folium.GeoJsonPopup(fields=['name'], aliases=['Region Name:'], max_width=300)
+    ).add_to(m)
+
+
+def add_station_markers(layer, locations, header_columns, color):
+    """A CircleMarker per station location, with the popups of station_popups()."""
+    popups = station_popups(locations, header_columns)
+    for lat, lon, popup_content in zip(locations['x coordinate'], locations['y coordinate'], popups):
+        folium.CircleMarker(
+            location=[lat, lon],
+            radius=1,
+            color=color,
+            fill=True,
+            fill_color=color,
+            fill_opacity=1,
+            popup=popup_content
+        ).add_to(layer)
+
+
+def station_cluster(locations, header_columns, color, name):
+    """Clustered station layer: [lat, lon, header fields, entries] rows and a lazy popup callback."""
+    headers = zip(*[locations[column].astype(str) for column in header_columns])
+    data = [[lat, lon, [list(field) for field in zip(header_columns, header)], [list(entry) for entry in entries]]
+            for lat, lon, header, entries in zip(locations['x coordinate'], locations['y coordinate'], headers, locations['Entries'])]
+    return FastMarkerCluster(data, callback=STATION_CALLBACK % (color, color), name=name, show=True)
+
+
+def house_cluster(houses, name):
+    """Clustered house layer: [lat, lon, unit] rows and a lazy popup callback."""
+    data = [[lat, lon, unit] for lat, lon, unit in zip(houses['Lat2'], houses['Lon2'], houses['Unit'].astype(str))]
+    return FastMarkerCluster(data, callback=HOUSE_CALLBACK, name=name, show=True)
+
+
+def connected_houses(people_data, units_with_stations):
+    """
+    Houses with coordinates and a unit, split into the ones whose unit has
+    charging stations and the others.
+    """
+    houses = people_data[['Lat2', 'Lon2', 'Unit']].dropna()
+    connected = houses['Unit'].astype(str).isin(units_with_stations).to_numpy()
+    return houses[connected], houses[~connected]
+
+
+def add_house_markers(layer, houses):
+    """A green star Marker per house."""
+    popups = ('House in ' + houses['Unit'].astype(str) + '<br>Latitude: ' + houses['Lat2'].astype(str) +
+              '<br>Longitude: ' + houses['Lon2'].astype(str))
+    for lat, lon, popup_content in zip(houses['Lat2'], houses['Lon2'], popups):
+        icon_star = BeautifyIcon(
+            icon='star',
+            inner_icon_style='color:green;font-size:10px;',  # Adjust the color and size of the star
+            background_color='transparent',
+            border_color='transparent'
+        )
+        folium.Marker(
+            location=[lat, lon],
+            icon=icon_star,  # Use the star icon
+            popup=popup_content
+        ).add_to(layer)
+
+
+def unit_lines(house_lat, house_lon, station_lat, station_lon):
+    """[[lon, lat], [lon, lat]] segment from every house to every station, in GeoJSON (lon, lat) order."""
+    houses = np.column_stack([house_lon, house_lat])
+    stations = np.column_stack([station_lon, station_lat])
+    segments = np.stack(np.broadcast_arrays(houses[:, None, :], stations[None, :, :]), axis=2)
+    return segments.reshape(-1, 2, 2).tolist()
+
+
+def add_lines(layer, houses, stations_by_unit):
+    """One MultiLineString feature per unit from its houses to its stations."""
+    for house_unit, unit_houses in houses.groupby('Unit', sort=False, observed=True):
+        stations = stations_by_unit.get(str(house_unit))
+        if stations is None:
+            continue
+
+        coordinates = unit_lines(unit_houses['Lat2'].to_numpy(), unit_houses['Lon2'].to_numpy(),
+                                 stations[:, 0], stations[:, 1])
+        folium.GeoJson(
+            {
+                'type': 'FeatureCollection',
+                'features': [{
+                    'type': 'Feature',
+                    'properties': {'Unit': str(house_unit)},
+                    'geometry': {'type': 'MultiLineString', 'coordinates': coordinates},
+                }],
+            },
+            style_function=line_style
+        ).add_to(layer)
+
+
+def build_map(new_stations, existing_stations, people_data, boundary_file='hcm.geojson', output_map='output_map.html',
+              render='auto'):
+    """
+    Build and save the map of new/existing charging stations, houses and
+    their connection lines. render is 'markers' (one marker per station
+    and house), 'cluster' (FastMarkerCluster layers on a canvas renderer,
+    popups built in the browser when opened) or 'auto' (cluster above
+    CLUSTER_THRESHOLD markers). Returns the wall time of every stage
+    (stations_build, houses_build, boundaries, stations_render,
+    houses_render, lines, save).
+    """
+    stage_times = dict.fromkeys(['stations_build', 'houses_build', 'boundaries', 'stations_render', 'houses_render',
+                                 'lines', 'save'], 0.0)
+
+    with timed('stations_build', stage_times):
+        new_by_unit = station_index(new_stations)
+        existing_by_unit = station_index(existing_stations)
+        new_locations = station_locations(new_stations, ['Unit'])
+        existing_locations = station_locations(existing_stations, ['Unit', 'Name'])
+    with timed('houses_build', stage_times):
+        houses, unconnected = connected_houses(people_data, set(new_by_unit) | set(existing_by_unit))
+
+    if render == 'auto':
+        render = 'cluster' if len(new_locations) + len(existing_locations) + len(houses) > CLUSTER_THRESHOLD else 'markers'
+
+    # Initialize a map centered at Ho Chi Minh City
+    m = folium.Map(location=[10.8231, 106.6297], zoom_start=13, prefer_canvas=render == 'cluster')
+
+    with timed('boundaries', stage_times):
+        add_boundaries(m, boundary_file)
+
+    with timed('stations_render', stage_times):
+        if render == 'cluster':
+            station_cluster(new_locations, ['Unit'], 'red', 'New Charging Stations').add_to(m)
+            station_cluster(existing_locations, ['Unit', 'Name'], 'blue', 'Existing Charging Stations').add_to(m)
+        else:
+            # Create layer groups for new and existing charging stations (to be toggled)
+            new_stations_layer = folium.FeatureGroup(name='New Charging Stations', show=True)
+            existing_stations_layer = folium.FeatureGroup(name='Existing Charging Stations', show=True)
+            add_station_markers(new_stations_layer, new_locations, ['Unit'], 'red')
+            add_station_markers(existing_stations_layer, existing_locations, ['Unit', 'Name'], 'blue')
+            new_stations_layer.add_to(m)
+            existing_stations_layer.add_to(m)
+
+    with timed('houses_render', stage_times):
+        for house_lat, house_lon, house_unit in unconnected.itertuples(index=False):
+            print(f"House at {house_lat}, {house_lon} in {house_unit} has no charging stations in its region.")
+        if render == 'cluster':
+            house_cluster(houses, 'Houses').add_to(m)
+        else:
+            # Create a feature group for house markers
+            houses_layer = folium.FeatureGroup(name='Houses', show=True)
+            add_house_markers(houses_layer, houses)
+            houses_layer.add_to(m)
+
+    # Create layer groups for line connections (filterable)
+    new_station_lines_layer = folium.FeatureGroup(name='Lines to New Charging Stations', show=True)
+    existing_station_lines_layer = folium.FeatureGroup(name='Lines to Existing Charging Stations', show=True)
+
+    with timed('lines', stage_times):
+        add_lines(new_station_lines_layer, houses, new_by_unit)
+        add_lines(existing_station_lines_layer, houses, existing_by_unit)
+        new_station_lines_layer.add_to(m)
+        existing_station_lines_layer.add_to(m)
+
+    # Optional: Print a summary of houses that weren't connected
+    if len(unconnected):
+        print(f"Unconnected Houses: {list(unconnected.itertuples(index=False, name=None))}")
+    else:
+        print("All houses are connected to at least one charging station.")
+
+    # Add LayerControl to switch between regions, charging stations, lines, and house locations
+    folium.LayerControl(collapsed=False).add_to(m)
+    m.get_root().html.add_child(folium.Element(LEGEND_HTML))
+
+    with timed('save', stage_times):
+        m.save(output_map)
+
+    return stage_times
@@ -0,0 +1,182 @@
+import time
+
+import gurobipy as gp
+from gurobipy import GRB
+import numpy as np
+
+from candidates import all_pairs, poi_sum_matrix
+from costs import DEFAULT_COSTS
+from profiler import stage
+
+
+def build_model(POI_group, dist, Budget, Demand, env=None, costs=None, linearize=False, pairs=None):
+    """
+    Build the "Minimize_Charging_Cost" model of one unit in matrix form.
+
+    dist is the (People, POI) distance matrix. x2, x3 and b are created
+    only for the (rows, cols) People-POI pairs given in pairs (every pair
+    when None, see candidates.candidate_pairs). The per-POI sums of x2, x3
+    and b are computed once and the land, fixed and transportation terms
+    are assembled as whole-vector quadratic expressions. The build time in
+    seconds is stored on model._build_time and the pairs on model._pairs.
+
+    With linearize=True the same model is written as a pure MILP (see
+    linearized_objective), which has the same optimal objective value.
+
+    Returns (model, x2, x3, b).
+    """
+    costs = {**DEFAULT_COSTS, **(costs or {})}
+    start = time.perf_counter()
+
+    n_people, n_poi = dist.shape
+    rows, cols = pairs if pairs is not None else all_pairs(n_people, n_poi)
+    n_pairs = len(rows)
+    dist_pairs = np.asarray(dist[rows, cols], dtype=float)
+    land = POI_group['Land_Cost'].to_numpy(dtype=float)
+    cap = costs['site_cap']
+
+    model = gp.Model("Minimize_Charging_Cost", env=env)
+
+    # Decision variables for each People-POI pair (number of chargers: x2 and x3)
+    x2 = model.addMVar(n_pairs, vtype=GRB.INTEGER, lb=0, ub=cap, name="x2")
+    x3 = model.addMVar(n_pairs, vtype=GRB.INTEGER, lb=0, ub=cap, name="x3")
+    b = model.addMVar(n_pairs, vtype=GRB.BINARY, name="b")
+
+    # Sums per POI, computed once
+    to_poi = poi_sum_matrix(cols, n_poi)
+    x2_poi = to_poi @ x2
+    x3_poi = to_poi @ x3
+    b_poi = to_poi @ b
+
+    # Objective: land, fixed and transportation costs
+    with stage('objective'):
+        if linearize:
+            model.setObjective(linearized_objective(model, x2, x3, x2_poi, x3_poi, b_poi, land, dist_pairs, n_people, costs), GRB.MINIMIZE)
+        else:
+            land_cost = (land / costs['land_divisor'] * (x2_poi + x3_poi) * b_poi).sum()
+            fixed_cost = (costs['fixed_x2'] * x2_poi * b_poi + costs['fixed_x3'] * x3_poi * b_poi).sum()
+            transportation_cost = ((costs['transport_x2'] * dist_pairs) * x2 * b + (costs['transport_x3'] * dist_pairs) * x3 * b).sum()
+            model.setObjective(land_cost + fixed_cost + transportation_cost, GRB.MINIMIZE)
+
+    # Constraints (added lazily, so the model update is part of this stage)
+    with stage('constraints'):
+        model.addConstr(
+            (costs['capex_x2'] * x2.sum() + costs['capex_x3'] * x3.sum()) <= (Budget / costs['budget_days']),
+            "Total_Charger_Upper_Bound"
+        )
+        model.addConstr(
+            (costs['capacity_x2'] * x2.sum() + costs['capacity_x3'] * x3.sum()) >= Demand,
+            "Total_Charger_Lower_Bound"
+        )
+        # model.addConstr(
+        #     (x2.sum() + x3.sum()) <= Slot,
+        #     "Total_Charger_Slot_Bound"
+        # )
+        model.addGenConstrIndicator(b, False, x2 + x3, GRB.EQUAL, 0.0, name="if else constraint_1")
+        model.addGenConstrIndicator(b, True, x2 + x3, GRB.GREATER_EQUAL, 1.0, name="if else constraint_2")
+        model.addConstr(x2_poi <= cap)
+        model.addConstr(x3_poi <= cap)
+
+        model.update()
+    model._pairs = (rows, cols)
+    model._shape = (n_people, n_poi)
+    model._build_time = time.perf_counter() - start
+    return model, x2, x3, b
+
+
+def linearized_objective(model, x2, x3, x2_poi, x3_poi, b_poi, land, dist_pairs, n_people, costs):
+    """
+    Exact linear form of the objective.
+
+    - Transportation: the indicator constraints force x2 = x3 = 0 whenever
+      b = 0, so x2 * b == x2 and x3 * b == x3.
+    - Land and fixed costs: the per-POI charger count (0..site_cap) is
+      written in binary, and each bit * b_poi product (b_poi is bounded by
+      the number of People nodes) is replaced by a McCormick variable,
+      which is exact because one factor is binary.
+    """
+    n_poi = len(land)
+    n_bits = int(costs['site_cap']).bit_length()
+    weights = 2.0 ** np.arange(n_bits)
+
+    products = []
+    for name, x_poi in (('x2', x2_poi), ('x3', x3_poi)):
+        bits = model.addMVar((n_poi, n_bits), vtype=GRB.BINARY, name=f"{name}_bit")
+        prod = model.addMVar((n_poi, n_bits), lb=0, ub=n_people, name=f"{name}_b_prod")
+        model.addConstr(x_poi == bits @ weights, f"{name}_binary_expansion")
+        for k in range(n_bits):
+            model.addConstr(prod[:, k] <= n_people * bits[:, k])
+            model.addConstr(prod[:, k] <= b_poi)
+            model.addConstr(prod[:, k] >= b_poi - n_people * (1 - bits[:, k]))
+        products.append(prod @ weights)  # == x_poi * b_poi
+    x2_b_poi, x3_b_poi = products
+
+    land_coef = land / costs['land_divisor']
+    site_cost = (land_coef + costs['fixed_x2']) @ x2_b_poi + (land_coef + costs['fixed_x3']) @ x3_b_poi
+    transportation_cost = (costs['transport_x2'] * dist_pairs) @ x2 + (costs['transport_x3'] * dist_pairs) @ x3
+    return site_cost + transportation_cost
+
+
+def build_site_model(POI_group, dist, Budget, Demand, env=None, costs=None, pairs=None):
+    """
+    Compact site-level version of the model.
+
+    Charger counts (y2, y3) and the open/close decision (o) are integer
+    variables per POI, and x2/x3 become continuous assignment flows per
+    People-POI pair (restricted to pairs when given) whose sums per POI
+    equal the site counts. The pair model always assigns all chargers of
+    an open POI to a single People node (b_poi == 1), so both models have
+    the same optimal objective, with 3 * |POI| integer variables instead
+    of 3 * |People| * |POI|.
+
+    Returns (model, x2, x3, None); b is derived from the flows after solving.
+    """
+    costs = {**DEFAULT_COSTS, **(costs or {})}
+    start = time.perf_counter()
+
+    n_people, n_poi = dist.shape
+    rows, cols = pairs if pairs is not None else all_pairs(n_people, n_poi)
+    n_pairs = len(rows)
+    dist_pairs = np.asarray(dist[rows, cols], dtype=float)
+    land = POI_group['Land_Cost'].to_numpy(dtype=float)
+    cap = costs['site_cap']
+
+    model = gp.Model("Minimize_Charging_Cost_Site", env=env)
+
+    # Decision variables per POI (number of chargers and open/close) and assignment flows per pair
+    y2 = model.addMVar(n_poi, vtype=GRB.INTEGER, lb=0, ub=cap, name="y2")
+    y3 = model.addMVar(n_poi, vtype=GRB.INTEGER, lb=0, ub=cap, name="y3")
+    o = model.addMVar(n_poi, vtype=GRB.BINARY, name="o")
+    x2 = model.addMVar(n_pairs, lb=0, name="x2")
+    x3 = model.addMVar(n_pairs, lb=0, name="x3")
+
+    # Objective: land and fixed costs per charger on each site, transportation per assigned charger and km
+    with stage('objective'):
+        land_coef = land / costs['land_divisor']
+        site_cost = (land_coef + costs['fixed_x2']) @ y2 + (land_coef + costs['fixed_x3']) @ y3
+        transportation_cost = (costs['transport_x2'] * dist_pairs) @ x2 + (costs['transport_x3'] * dist_pairs) @ x3
+        model.setObjective(site_cost + transportation_cost, GRB.MINIMIZE)
+
+    # Constraints (added lazily, so the model update is part of this stage)
+    with stage('constraints'):
+        model.addConstr(
+            (costs['capex_x2'] * y2.sum() + costs['capex_x3'] * y3.sum()) <= (Budget / costs['budget_days']),
+            "Total_Charger_Upper_Bound"
+        )
+        model.addConstr(
+            (costs['capacity_x2'] * y2.sum() + costs['capacity_x3'] * y3.sum()) >= Demand,
+            "Total_Charger_Lower_Bound"
+        )
+        to_poi = poi_sum_matrix(cols, n_poi)
+        model.addConstr(to_poi @ x2 == y2, "Assign_x2")
+        model.addConstr(to_poi @ x3 == y3, "Assign_x3")
+        model.addConstr(y2 <= cap * o, "Open_x2")
+        model.addConstr(y3 <= cap * o, "Open_x3")
+        model.addConstr(y2 + y3 >= o, "Open_Site")
+
+        model.update()
+    model._pairs = (rows, cols)
+    model._shape = (n_people, n_poi)
+    model._site_vars = (y2, y3, o)
+    model._build_time = time.perf_counter() - start
+    return model, x2, x3, None
@@ -0,0 +1,102 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import gurobipy as gp
+import numpy as np
+
+from costs import DEFAULT_COSTS
+
+
+# Folder where the built models are stored
+CACHE_DIR = 'cache/models'
+
+
+def model_fingerprint(POI_group, People_group, Budget, Demand, dist, formulation, linearize=False, pairs=None, costs=None):
+    """Short sha256 of everything a built model depends on."""
+    h = hashlib.sha256()
+    h.update(POI_group[['Lat1', 'Lon1', 'Land_Cost']].to_csv(index=False).encode())
+    h.update(People_group[['Lat2', 'Lon2']].to_csv(index=False).encode())
+    h.update(json.dumps({
+        'Budget': float(Budget),
+        'Demand': float(Demand),
+        'formulation': formulation,
+        'linearize': bool(linearize),
+        'costs': {**DEFAULT_COSTS, **(costs or {})},
+    }, sort_keys=True).encode())
+    h.update(np.ascontiguousarray(dist, dtype=float).tobytes())
+    if pairs is not None:
+        h.update(np.ascontiguousarray(pairs[0]).tobytes())
+        h.update(np.ascontiguousarray(pairs[1]).tobytes())
+    return h.hexdigest()[:16]
+
+
+def var_range(mvar):
+    """(first index, size) of the contiguous variables of an MVar."""
+    variables = mvar.tolist()
+    return (variables[0].index if variables else 0), len(variables)
+
+
+def save_model(key, model, variables):
+    """
+    Write the model as MPS and, next to it, the map from its variable
+    indices back to the x2/x3/b (and site) MVars and the (person, POI)
+    pairs they belong to.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, key)
+    model.write(f'{path}.mps')
+
+    ranges = {name: var_range(mvar) for name, mvar in variables.items() if mvar is not None}
+    rows, cols = model._pairs
+    np.savez(f'{path}.npz', rows=rows, cols=cols, shape=np.array(model._shape),
+             ranges=json.dumps(ranges))
+
+
+def load_model(key, env=None):
+    """
+    Read a cached model back. Returns (model, variables), with the same
+    model attributes (_pairs, _shape, _site_vars, _build_time) as a
+    freshly built one, or None when the key is not cached.
+    """
+    path = os.path.join(CACHE_DIR, key)
+    if not (os.path.exists(f'{path}.mps') and os.path.exists(f'{path}.npz')):
+        return None
+
+    start = time.perf_counter()
+    model = gp.read(f'{path}.mps', env=env) if env is not None else gp.read(f'{path}.mps')
+    index_map = np.load(f'{path}.npz')
+    model_vars = model.getVars()
+
+    variables = {}
+    for name, (first, size) in json.loads(str(index_map['ranges'])).items():
+        variables[name] = gp.MVar.fromlist(model_vars[first:first + size])
+
+    model._pairs = (index_map['rows'], index_map['cols'])
+    model._shape = tuple(int(n) for n in index_map['shape'])
+    if 'y2' in variables:
+        model._site_vars = (variables['y2'], variables['y3'], variables['o'])
+    model._build_time = time.perf_counter() - start
+    return model, variables
+
+
+def clear_cache():
+    """Invalidate every cached model."""
+    if os.path.exists(CACHE_DIR):
+        shutil.rmtree(CACHE_DIR)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage the built-model cache.')
+    parser.add_argument('--clear', action='store_true', help='Delete every cached model')
+    args = parser.parse_args()
+
+    if args.clear:
+        clear_cache()
+        print(f"Model cache {CACHE_DIR} cleared")
+    else:
+        count = len([name for name in os.listdir(CACHE_DIR) if name.endswith('.mps')]) if os.path.exists(CACHE_DIR) else 0
+        print(f"{count} cached models in {CACHE_DIR}")
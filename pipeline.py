@@ -0,0 +1,324 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+
+# Fingerprints of the files seen and of the inputs/outputs of every task that ran
+STATE_PATH = 'cache/pipeline/state.json'
+
+# Pipeline files
+UNIT_FILE = 'Unit.csv'
+POI_FILE = 'POI.csv'
+PEOPLE_FILE = 'PEOPLE_OLD.csv'
+CONSTRAINT_FILE = 'CONSTRAINT.csv'
+EXISTING_FILE = 'EXISTING.csv'
+BOUNDARY_FILE = 'hcm.geojson'
+RESULT_DIR = 'result_x2_x3'
+VISUALIZE_DIR = 'input_visualize'
+OUTPUT_DIR = 'output_visualize'
+COMBINED_FILE = 'output_visualize/Combined_Output.csv'
+MAP_FILE = 'output_map.html'
+
+STAGES = ['distance', 'solve', 'combine', 'map']
+
+
+class Task:
+    """
+    One node of the pipeline DAG: func(*args) reads the inputs files and
+    writes the outputs files once every task in deps is done. params are
+    the non-file settings that also decide whether the outputs are stale.
+    Missing input files are part of the fingerprint (a file appearing
+    makes the task stale); only the outputs that exist are recorded.
+    """
+
+    def __init__(self, name, func, args=(), inputs=(), outputs=(), deps=(), params=None):
+        self.name = name
+        self.stage = name.split('/')[0]
+        self.func = func
+        self.args = args
+        self.inputs = inputs
+        self.outputs = outputs
+        self.deps = deps
+        self.params = params or {}
+
+
+class State:
+    """
+    Stored fingerprints. File hashes are reused while the file's size and
+    modification time are unchanged, so a run where nothing changed only
+    stats the files.
+    """
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self.data = {'files': {}, 'tasks': {}, 'units': {}}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.data = json.load(f)
+
+    def file_hash(self, path):
+        """Content sha256 of a file (None when missing)."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        cached = self.data['files'].get(path)
+        if cached is not None and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return cached[2]
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        digest = h.hexdigest()[:16]
+        self.data['files'][path] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def task_key(self, task):
+        """Hash of the task name, its params and the content of its input files."""
+        payload = {'task': task.name, 'params': task.params,
+                   'inputs': {path: self.file_hash(path) for path in task.inputs}}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()).hexdigest()[:16]
+
+    def stale_reason(self, task, key):
+        """Why the task has to run, or None when its recorded outputs are up to date."""
+        record = self.data['tasks'].get(task.name)
+        if record is None:
+            return 'never ran'
+        if record['key'] != key:
+            return 'inputs changed'
+        for path, digest in record['outputs'].items():
+            current = self.file_hash(path)
+            if current is None:
+                return f'{path} is missing'
+            if current != digest:
+                return f'{path} was modified'
+        return None
+
+    def record(self, task, key):
+        outputs = {path: self.file_hash(path) for path in task.outputs if os.path.exists(path)}
+        self.data['tasks'][task.name] = {'key': key, 'outputs': outputs, 'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=1)
+
+
+def unit_hashes(state, units):
+    """
+    Hash of the POI, People and Constraint rows of every unit, so editing
+    one unit's rows only invalidates that unit. Cached by the hashes of
+    the three files.
+    """
+    files_key = '|'.join(state.file_hash(path) or '' for path in (POI_FILE, PEOPLE_FILE, CONSTRAINT_FILE))
+    cached = state.data['units']
+    if cached.get('files') == files_key and all(unit in cached['hashes'] for unit in units):
+        return cached['hashes']
+
+    import pandas as pd
+
+    from inputs import load_inputs, unit_rows
+
+    tables = load_inputs(POI_FILE, PEOPLE_FILE, CONSTRAINT_FILE)
+    hashes = {}
+    for unit in units:
+        h = hashlib.sha256()
+        for df in tables:
+            rows = unit_rows(df, unit).drop(columns='Unit')
+            h.update(pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes())
+            h.update(','.join(rows.columns).encode())
+        hashes[unit] = h.hexdigest()[:16]
+    state.data['units'] = {'files': files_key, 'hashes': hashes}
+    return hashes
+
+
+def distance_task(road_graph=None):
+    """
+    Distance cache of every unit (keyed by the input hashes), built once
+    before the solve tasks start so they only read it.
+    """
+    if road_graph is not None:
+        from road_network import build_road_distance_cache
+        build_road_distance_cache(road_graph, POI_FILE, PEOPLE_FILE)
+    else:
+        from distance_matrix import build_distance_cache
+        build_distance_cache(POI_FILE, PEOPLE_FILE)
+
+
+def solve_task(unit, backend, threads, solve_options):
+    """Solve one unit with Gurobi (batch_solve worker) or another backend and write its results."""
+    if backend == 'gurobi':
+        from batch_solve import solve_and_save
+        solve_and_save(unit, threads, solve_options)
+    else:
+        from backends import solve_unit_with_backend
+        from results import write_results
+        options = {key: solve_options.get(key) for key in ('k_nearest', 'radius_km', 'road_graph')}
+        write_results(solve_unit_with_backend(unit, backend=backend, threads=threads, **options), RESULT_DIR)
+
+
+def combine_unit_task(unit):
+    """
+    Output_<unit>.csv of one unit. A hand-made input_visualize/<unit>.csv
+    older than the unit's sparse solver result is stale: the result is
+    read instead.
+    """
+    from combined_output import unit_output
+
+    visualize_path = f'{VISUALIZE_DIR}/{unit}.csv'
+    sparse_path = f'{RESULT_DIR}/results_unit_{unit}.parquet'
+    prefer_results = (os.path.exists(visualize_path) and os.path.exists(sparse_path)
+                      and os.path.getmtime(sparse_path) > os.path.getmtime(visualize_path))
+    if prefer_results:
+        print(f"{visualize_path} is older than {sparse_path}, using the solver result")
+    if unit_output(unit, VISUALIZE_DIR, RESULT_DIR, OUTPUT_DIR, prefer_results=prefer_results) is None:
+        raise RuntimeError(f"Could not combine the results of {unit}")
+
+
+def combine_task(units):
+    """Concatenate the Output_<unit>.csv files in unit order into Combined_Output.csv."""
+    import pandas as pd
+
+    frames = [pd.read_csv(f'{OUTPUT_DIR}/Output_{unit}.csv') for unit in units]
+    pd.concat(frames, ignore_index=True).to_csv(COMBINED_FILE, index=False)
+
+
+def map_task(render):
+    import pandas as pd
+
+    from inputs import load_existing, load_table
+    from map_builder import build_map
+
+    build_map(pd.read_csv(COMBINED_FILE), load_existing(EXISTING_FILE), load_table(PEOPLE_FILE, 'People'),
+              boundary_file=BOUNDARY_FILE, output_map=MAP_FILE, render=render)
+
+
+def pipeline_tasks(state, units, backend='gurobi', threads=1, solve_options=None, render='auto'):
+    """
+    The distance -> solve -> combine -> map DAG, with one solve and one
+    combine task per unit. A unit's result is the sparse Parquet file
+    written by the solver or the legacy dense CSV (see
+    results.result_file). The distance task has no tracked outputs: its
+    cache folder is keyed by the input hashes, and a solve that finds it
+    missing rebuilds it.
+    """
+    solve_options = solve_options or {}
+    hashes = unit_hashes(state, units)
+    road_graph = [solve_options['road_graph']] if solve_options.get('road_graph') else []
+    tasks = [Task('distance', distance_task, (solve_options.get('road_graph'),), inputs=[POI_FILE, PEOPLE_FILE, *road_graph])]
+    for unit in units:
+        result_paths = [f'{RESULT_DIR}/results_unit_{unit}.{extension}' for extension in ('parquet', 'csv')]
+        tasks.append(Task(f'solve/{unit}', solve_task, (unit, backend, threads, solve_options), inputs=road_graph,
+                          outputs=result_paths, deps=['distance'],
+                          params={'unit_data': hashes[unit], 'backend': backend, **solve_options}))
+        tasks.append(Task(f'combine/{unit}', combine_unit_task, (unit,),
+                          inputs=[f'{VISUALIZE_DIR}/{unit}.csv', *result_paths],
+                          outputs=[f'{OUTPUT_DIR}/Output_{unit}.csv'], deps=[f'solve/{unit}']))
+    tasks.append(Task('combine', combine_task, (list(units),),
+                      inputs=[f'{OUTPUT_DIR}/Output_{unit}.csv' for unit in units],
+                      outputs=[COMBINED_FILE], deps=[f'combine/{unit}' for unit in units]))
+    tasks.append(Task('map', map_task, (render,),
+                      inputs=[COMBINED_FILE, EXISTING_FILE, PEOPLE_FILE, BOUNDARY_FILE],
+                      outputs=[MAP_FILE], deps=['combine'], params={'render': render}))
+    return tasks
+
+
+def run_pipeline(tasks, state, workers=None, force=(), dry_run=False, touch=False):
+    """
+    Run the tasks in dependency order, independent tasks in parallel,
+    skipping every task whose input fingerprint and outputs match the
+    state. dry_run only reports what is stale; touch records the existing
+    outputs as up to date without running anything. Returns the names of
+    the tasks that ran (or would run) and of those that failed.
+    """
+    pending = {task.name: task for task in tasks}
+    outputs = {task.name: task.outputs for task in tasks}
+    done, ran, failed = set(), [], []
+    running = {}
+    executor = None
+    try:
+        while pending or running:
+            for task in [task for task in pending.values() if all(dep in done for dep in task.deps)]:
+                del pending[task.name]
+                if any(dep in failed for dep in task.deps):
+                    failed.append(task.name)
+                    print(f"{task.name}: skipped, an upstream task failed")
+                    continue
+                key = state.task_key(task)
+                reason = 'forced' if task.stage in force else state.stale_reason(task, key)
+                # Only an upstream task with outputs can make this one stale
+                if dry_run and reason is None and any(dep in ran and outputs[dep] for dep in task.deps):
+                    reason = 'upstream is stale'
+                if reason is None:
+                    done.add(task.name)
+                    continue
+                if dry_run or touch:
+                    if touch and any(os.path.exists(path) for path in task.outputs):
+                        state.record(task, key)
+                        reason = f'{reason}, outputs recorded as up to date'
+                    else:
+                        ran.append(task.name)
+                    print(f"{task.name}: {reason}")
+                    done.add(task.name)
+                    continue
+                print(f"{task.name}: {reason}, running")
+                executor = executor or ProcessPoolExecutor(max_workers=workers)
+                running[executor.submit(task.func, *task.args)] = (task, key, time.perf_counter())
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                task, key, start = running.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    failed.append(task.name)
+                    print(f"{task.name}: failed: {e}")
+                    continue
+                state.record(task, key)
+                state.save()
+                done.add(task.name)
+                ran.append(task.name)
+                print(f"{task.name}: done in {time.perf_counter() - start:.2f} seconds")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        state.save()
+    return ran, failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the solve -> combine -> map pipeline, skipping the up-to-date tasks.')
+    parser.add_argument('--workers', type=int, default=None, help='Tasks run concurrently (default: one per core)')
+    parser.add_argument('--backend', choices=['gurobi', 'highs'], default='gurobi')
+    parser.add_argument('--formulation', choices=['pair', 'site'], default='pair')
+    parser.add_argument('--k-nearest', type=int, default=None)
+    parser.add_argument('--radius-km', type=float, default=None)
+    parser.add_argument('--road-graph', default=None, help='Price transportation on the road distances of this OSM extract')
+    parser.add_argument('--render', choices=['auto', 'markers', 'cluster'], default='auto')
+    parser.add_argument('--force', nargs='+', choices=STAGES, default=[], help='Re-run these stages anyway')
+    parser.add_argument('--dry-run', action='store_true', help='Only list the stale tasks')
+    parser.add_argument('--touch', action='store_true',
+                        help='Record the existing outputs as up to date without running (adopt the committed results)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    state = State()
+    with open(UNIT_FILE, encoding='utf-8') as f:
+        units = [row['Unit'] for row in csv.DictReader(f)]
+    workers = args.workers or os.cpu_count() or 1
+    solve_options = {'formulation': args.formulation, 'k_nearest': args.k_nearest, 'radius_km': args.radius_km}
+    if args.road_graph is not None:
+        solve_options['road_graph'] = args.road_graph
+    tasks = pipeline_tasks(state, units, backend=args.backend, threads=max(1, (os.cpu_count() or 1) // workers),
+                           solve_options=solve_options, render=args.render)
+
+    ran, failed = run_pipeline(tasks, state, workers=workers, force=args.force, dry_run=args.dry_run, touch=args.touch)
+    verb = 'stale' if args.dry_run else 'ran'
+    print(f"{len(tasks)} tasks: {len(ran)} {verb}, {len(failed)} failed, "
+          f"{len(tasks) - len(ran) - len(failed)} up to date ({time.perf_counter() - start:.2f} seconds)")
@@ -0,0 +1,194 @@
+import cProfile
+import json
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+
+# Folder where the per-run profile reports are written
+PROFILE_DIR = 'profiles'
+
+# Width of the flame bars of the text summary
+FLAME_WIDTH = 40
+
+
+def current_rss():
+    """Resident set size of this process in MB (from /proc on Linux, else the peak so far)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Profiler:
+    """
+    Named, nestable stage timers of one run. Every stage records its wall
+    time and the RSS before/after and at its peak (sampled by a background
+    thread every interval seconds). With trace_memory the tracemalloc
+    peak of Python allocations is recorded too, and with cprofile every
+    top-level stage runs under cProfile and the slowest one is dumped to a
+    .prof file. report() writes <run>_<time>.json and a flame-style .txt.
+    """
+
+    def __init__(self, run_name, output_dir=PROFILE_DIR, trace_memory=False, cprofile=False, interval=0.01):
+        self.run_name = run_name
+        self.output_dir = output_dir
+        self.trace_memory = trace_memory
+        self.cprofile = cprofile
+        self.interval = interval
+        self.started_at = datetime.now()
+        self.start = time.perf_counter()
+        self.stages = []
+        self.open = []
+        self.hottest = None  # (stage record, cProfile.Profile) of the slowest top-level stage
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.peak_rss = current_rss()
+        self.done = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, daemon=True)
+        self.sampler.start()
+
+    def sample(self):
+        while not self.done.wait(self.interval):
+            rss = current_rss()
+            self.peak_rss = max(self.peak_rss, rss)
+            for record in list(self.open):
+                record['peak_rss_mb'] = max(record['peak_rss_mb'], rss)
+
+    def fold_traced_peak(self):
+        """Credit the tracemalloc peak since the last reset to every open stage, then reset it."""
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        for record in self.open:
+            record['traced_peak_mb'] = max(record['traced_peak_mb'], peak)
+        tracemalloc.reset_peak()
+
+    @contextmanager
+    def stage(self, name):
+        rss = current_rss()
+        record = {
+            'name': name,
+            'path': ';'.join([parent['name'] for parent in self.open] + [name]),
+            'depth': len(self.open),
+            'start': time.perf_counter() - self.start,
+            'wall_time': None,
+            'self_time': None,
+            'rss_before_mb': rss,
+            'rss_after_mb': None,
+            'peak_rss_mb': rss,
+        }
+        if self.trace_memory:
+            self.fold_traced_peak()
+            record['traced_before_mb'] = tracemalloc.get_traced_memory()[0] / 2**20
+            record['traced_peak_mb'] = record['traced_before_mb']
+        self.stages.append(record)
+        self.open.append(record)
+
+        profile = cProfile.Profile() if self.cprofile and record['depth'] == 0 else None
+        start = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile is not None:
+                profile.disable()
+            record['wall_time'] = time.perf_counter() - start
+            if self.trace_memory:
+                self.fold_traced_peak()
+                record['traced_after_mb'] = tracemalloc.get_traced_memory()[0] / 2**20
+            self.open.pop()
+            record['self_time'] = record['wall_time'] - record.pop('child_time', 0.0)
+            if self.open:
+                self.open[-1]['child_time'] = self.open[-1].get('child_time', 0.0) + record['wall_time']
+            rss = current_rss()
+            record['rss_after_mb'] = rss
+            record['peak_rss_mb'] = max(record['peak_rss_mb'], rss)
+            if profile is not None and (self.hottest is None or record['wall_time'] > self.hottest[0]['wall_time']):
+                self.hottest = (record, profile)
+
+    def flame_text(self, total):
+        """One line per stage: a bar placed and sized by its share of the run, wall and self time, peak RSS."""
+        lines = [f"{self.run_name}: {total:.3f} s, peak RSS {self.peak_rss:.1f} MB"]
+        for record in self.stages:
+            offset = int(record['start'] / total * FLAME_WIDTH) if total else 0
+            width = max(1, round(record['wall_time'] / total * FLAME_WIDTH)) if total else 1
+            bar = (' ' * offset + '█' * width).ljust(FLAME_WIDTH)[:FLAME_WIDTH]
+            label = '  ' * record['depth'] + record['name']
+            memory = f"peak {record['peak_rss_mb']:8.1f} MB"
+            if 'traced_peak_mb' in record:
+                memory += f", traced {record['traced_peak_mb']:8.1f} MB"
+            lines.append(f"|{bar}| {label:<28} {record['wall_time']:9.3f} s {record['wall_time'] / total if total else 0:6.1%}"
+                         f"  self {record['self_time']:9.3f} s  {memory}")
+        return '\n'.join(lines)
+
+    def stop(self):
+        """Stop the RSS sampler (and tracemalloc). Returns the total wall time of the run."""
+        self.done.set()
+        self.sampler.join()
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        return time.perf_counter() - self.start
+
+    def report(self):
+        """Write the JSON report, the flame-style text summary and the cProfile dump. Returns the report."""
+        total = self.stop()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"{self.run_name}_{self.started_at:%Y%m%d_%H%M%S}")
+        report = {
+            'run': self.run_name,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'total_time': total,
+            'peak_rss_mb': self.peak_rss,
+            'trace_memory': self.trace_memory,
+            'stages': self.stages,
+            'cprofile': None,
+        }
+        if self.hottest is not None:
+            record, profile = self.hottest
+            report['cprofile'] = {'stage': record['name'], 'path': f"{base}_{record['name'].replace(' ', '_')}.prof"}
+            profile.dump_stats(report['cprofile']['path'])
+
+        with open(f'{base}.json', 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        with open(f'{base}.txt', 'w', encoding='utf-8') as f:
+            f.write(self.flame_text(total) + '\n')
+        report['files'] = [f'{base}.json', f'{base}.txt']
+        return report
+
+
+# Profiler of the running script, used by the stage() markers inside the library modules
+_active = None
+
+
+def start_profile(run_name, **kwargs):
+    """Start profiling this run; stage() calls anywhere in the process are recorded until finish_profile()."""
+    global _active
+    _active = Profiler(run_name, **kwargs)
+    return _active
+
+
+def stage(name):
+    """Time the block as a stage of the active profiler (no-op when nothing is being profiled)."""
+    return _active.stage(name) if _active is not None else nullcontext()
+
+
+def finish_profile():
+    """Write the report of the active profiler, print the flame summary and where the files went."""
+    global _active
+    if _active is None:
+        return None
+    report = _active.report()
+    _active = None
+    with open(report['files'][1], encoding='utf-8') as f:
+        print(f.read(), end='')
+    print(f"Profile saved to {', '.join(report['files'])}")
+    if report['cprofile'] is not None:
+        print(f"cProfile of the slowest stage '{report['cprofile']['stage']}' saved to {report['cprofile']['path']}")
+    return report
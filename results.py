@@ -0,0 +1,202 @@
+import csv
+import json
+import os
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# Solve statistics kept in the Parquet schema metadata of a sparse result
+RESULT_METADATA = ['unit', 'formulation', 'backend', 'optimal_solution', 'build_time', 'solve_time',
+                   'mip_gap', 'status', 'first_incumbent_time', 'pruning']
+
+# x2/x3 values at or below this magnitude are solver noise and not stored
+ZERO_TOL = 1e-9
+
+
+def sparse_result_table(result):
+    """
+    Nonzero x2/x3 entries of a solved unit, one row per (type, person, POI):
+    Unit, Type ('x2 value'/'x3 value'), Value, Column (POI index), Row
+    (person index) and the POI (Lat1, Lon1) and person (Lat2, Lon2)
+    coordinates. Values are kept as they are: the continuous flows of the
+    site formulation can split a POI's chargers fractionally between
+    equidistant people, and rounding each cell would change the totals.
+    """
+    poi_coordinates = result.get('poi_coordinates')
+    people_coordinates = result.get('people_coordinates')
+    frames = []
+    for label, key in (('x2 value', 'x2_values'), ('x3 value', 'x3_values')):
+        values = np.asarray(result[key], dtype=float)
+        rows, cols = np.nonzero(np.abs(values) > ZERO_TOL)
+        frame = pd.DataFrame({
+            'Unit': result['unit'],
+            'Type': label,
+            'Value': values[rows, cols],
+            'Column': cols.astype(np.int32),
+            'Row': rows.astype(np.int32),
+        })
+        if poi_coordinates is not None:
+            frame['Lat1'] = poi_coordinates[cols, 0]
+            frame['Lon1'] = poi_coordinates[cols, 1]
+        if people_coordinates is not None:
+            frame['Lat2'] = people_coordinates[rows, 0]
+            frame['Lon2'] = people_coordinates[rows, 1]
+        frames.append(frame)
+
+    table = pd.concat(frames, ignore_index=True)
+    table['Unit'] = table['Unit'].astype('category')
+    table['Type'] = table['Type'].astype('category')
+    return table
+
+
+def write_sparse_results(result, result_dir='result_x2_x3'):
+    """
+    Save the nonzero x2/x3 entries of a solved unit as results_unit_*.parquet,
+    with the objective, the solve statistics and the (People, POI) shape in
+    the schema metadata.
+    """
+    metadata = {key: result.get(key) for key in RESULT_METADATA}
+    metadata['shape'] = list(np.shape(result['x2_values']))
+
+    table = pa.Table.from_pandas(sparse_result_table(result), preserve_index=False)
+    table = table.replace_schema_metadata({**table.schema.metadata,
+                                           b'result': json.dumps(metadata, default=float).encode()})
+    result_file_path = f'{result_dir}/results_unit_{result["unit"]}.parquet'
+    pq.write_table(table, result_file_path)
+    return result_file_path
+
+
+def read_sparse_results(result_file_path):
+    """Sparse entries (DataFrame) and solve metadata (dict) of a results_unit_*.parquet file."""
+    table = pq.read_table(result_file_path)
+    metadata = json.loads(table.schema.metadata[b'result'])
+    return table.to_pandas(), metadata
+
+
+def result_file(unit_name, result_dir='result_x2_x3'):
+    """Result file of a unit, preferring the sparse Parquet file over the legacy dense CSV."""
+    for extension in ('parquet', 'csv'):
+        path = f'{result_dir}/results_unit_{unit_name}.{extension}'
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def write_results(result, result_dir='result_x2_x3', data_dir='data_time', dense_csv=False):
+    """
+    Save the sparse x2/x3 result and the callback trace of a solved unit.
+    dense_csv additionally writes the legacy dense x2/x3/b matrix CSV.
+    """
+    unit_name = result['unit']
+    write_sparse_results(result, result_dir)
+    if dense_csv:
+        write_dense_results(result, result_dir)
+
+    # Save callback data to a CSV file
+    callback_data_filename = f'{data_dir}/data_{unit_name}.csv'
+    with open(callback_data_filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Time', 'Objective Value', 'Best Bound', 'Event'])
+        writer.writerows(result['callback_data'])
+
+    return callback_data_filename
+
+
+def write_dense_results(result, result_dir='result_x2_x3'):
+    """Save the dense x2/x3/b matrices of a solved unit (legacy results_unit_*.csv format)."""
+    unit_name = result['unit']
+
+    # Save results to a single CSV file
+    with open(f'{result_dir}/results_unit_{unit_name}.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+
+        # Write x2 values
+        writer.writerow(['x2 values'])
+        writer.writerows(result['x2_values'])
+
+        # Write x3 values
+        writer.writerow([])
+        writer.writerow(['x3 values'])
+        writer.writerows(result['x3_values'])
+
+        # Write b values
+        writer.writerow(['b values'])
+        writer.writerows(result['b_values'])
+
+        # Write optimal solution
+        writer.writerow([])
+        writer.writerow(['Optimal Solution'])
+        writer.writerow([result['optimal_solution']])
+
+
+def read_objective(result_file_path):
+    """Objective value of a results_unit_*.parquet file, or stored under 'Optimal Solution' in a results_unit_*.csv file."""
+    if result_file_path.endswith('.parquet'):
+        return json.loads(pq.read_schema(result_file_path).metadata[b'result'])['optimal_solution']
+    with open(result_file_path, newline='') as f:
+        rows = list(csv.reader(f))
+    for index, row in enumerate(rows):
+        if row and row[0] == 'Optimal Solution':
+            return float(rows[index + 1][0])
+    return None
+
+
+def read_result_matrices(result_file_path):
+    """Dense x2/x3/b matrices and the objective of a results_unit_*.parquet or results_unit_*.csv file."""
+    if result_file_path.endswith('.parquet'):
+        entries, metadata = read_sparse_results(result_file_path)
+        matrices = {}
+        for label, key in (('x2 value', 'x2_values'), ('x3 value', 'x3_values')):
+            matrices[key] = np.zeros(metadata['shape'])
+            selected = entries[entries['Type'] == label]
+            matrices[key][selected['Row'].to_numpy(), selected['Column'].to_numpy()] = selected['Value'].to_numpy()
+        return {**matrices, 'b_values': None, 'optimal_solution': metadata['optimal_solution']}
+
+    sections = {'x2 values': [], 'x3 values': [], 'b values': [], 'Optimal Solution': []}
+    current = None
+    with open(result_file_path, newline='') as f:
+        for row in csv.reader(f):
+            if not row:
+                continue
+            if row[0] in sections:
+                current = row[0]
+            elif current is not None:
+                sections[current].append([float(value) for value in row])
+
+    return {
+        'x2_values': np.array(sections['x2 values']),
+        'x3_values': np.array(sections['x3 values']),
+        'b_values': np.array(sections['b values']) if sections['b values'] else None,
+        'optimal_solution': sections['Optimal Solution'][0][0] if sections['Optimal Solution'] else None,
+    }
+
+
+def plot_progress(unit_name, callback_data_filename):
+    """Plot the Objective Value and Best Bound over time of a solved unit."""
+    data = pd.read_csv(callback_data_filename)
+    if 'Event' in data:
+        data = data[data['Event'] != 'MIPSOL']
+
+    plt.figure(figsize=(12, 8))
+
+    # Plot the Objective Value with markers and the Best Bound with a dashed line
+    plt.plot(data['Time'], data['Objective Value'], label='Objective Value', color='orange', linewidth=2, marker='o')
+    plt.plot(data['Time'], data['Best Bound'], label='Best Bound', color='gray', linewidth=2, linestyle='--', marker='x')
+
+    plt.xlabel('Time (seconds)', fontsize=14)
+    plt.ylabel('Value', fontsize=14)
+    plt.title(f'{unit_name}', fontsize=16)
+
+    # Use logarithmic scale for the y-axis and add a grid for better readability
+    plt.yscale('log')
+    plt.grid(True, linestyle='--', alpha=0.7)
+    plt.legend()
+
+    # Save the plot with a filename associated with the unit name
+    plot_filename = f'plot_name/plot_{unit_name}.png'
+    plt.savefig(plot_filename)
+    return plot_filename
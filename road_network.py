@@ -0,0 +1,245 @@
+import argparse
+import os
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components, dijkstra
+from scipy.spatial import cKDTree
+
+from candidates import unit_sphere
+from distance_matrix import R, haversine_matrix
+from inputs import atomic_write, file_fingerprint, load_table, unit_rows
+
+
+# Folders where the parsed road graphs and the per-unit road distance matrices are stored
+GRAPH_CACHE_DIR = 'cache/road_graph'
+CACHE_DIR = 'cache/road_distance'
+
+# Small bundled road graph (a grid over Cần Giờ cut by a river with one bridge), see write_test_graph
+TEST_GRAPH = 'road_test.osm'
+
+# Points farther than this from every road node (km) are off the network: their pairs keep the haversine distance
+MAX_SNAP_KM = 2.0
+
+# Values of the OSM oneway tag
+ONEWAY_FORWARD = ('yes', 'true', '1')
+ONEWAY_BACKWARD = ('-1', 'reverse')
+
+
+def great_circle(lat1, lon1, lat2, lon2):
+    """Elementwise great-circle distance (km) between two arrays of points, from their unit sphere chord."""
+    chord = np.linalg.norm(unit_sphere(lat1, lon1) - unit_sphere(lat2, lon2), axis=1)
+    return 2 * R * np.arcsin(np.clip(chord / 2, 0.0, 1.0))
+
+
+def read_osm(path):
+    """
+    Nodes and directed edges of the highway ways of an OSM XML extract.
+    Returns (lat, lon, source, target) with the edge ends as indices into
+    lat/lon; only the nodes used by a highway are kept.
+    """
+    coordinates = {}
+    sources, targets = [], []
+    for _, element in ET.iterparse(path, events=('end',)):
+        if element.tag == 'node':
+            coordinates[int(element.get('id'))] = (float(element.get('lat')), float(element.get('lon')))
+            element.clear()
+        elif element.tag == 'way':
+            tags = {tag.get('k'): tag.get('v') for tag in element.iter('tag')}
+            refs = [int(nd.get('ref')) for nd in element.iter('nd')]
+            if 'highway' in tags and len(refs) > 1:
+                oneway = tags.get('oneway', 'no')
+                if oneway not in ONEWAY_BACKWARD:
+                    sources.extend(refs[:-1])
+                    targets.extend(refs[1:])
+                if oneway not in ONEWAY_FORWARD:
+                    sources.extend(refs[1:])
+                    targets.extend(refs[:-1])
+            element.clear()
+
+    node_ids, edge_nodes = np.unique(np.array([sources, targets], dtype=np.int64), return_inverse=True)
+    lat_lon = np.array([coordinates[node_id] for node_id in node_ids], dtype=float).reshape(-1, 2)
+    source, target = edge_nodes.reshape(2, -1)
+    return lat_lon[:, 0], lat_lon[:, 1], source, target
+
+
+def road_graph(path):
+    """
+    Road graph of an OSM extract as a CSR matrix of edge lengths (km, the
+    shortest one where ways overlap) plus the node coordinates, cached
+    as an .npz file keyed by the hash of the extract.
+    """
+    cache_path = os.path.join(GRAPH_CACHE_DIR, f'{os.path.basename(path)}.{file_fingerprint(path)}.npz')
+    if os.path.exists(cache_path):
+        data = np.load(cache_path)
+        n = len(data['lat'])
+        return sp.csr_matrix((data['data'], data['indices'], data['indptr']), shape=(n, n)), data['lat'], data['lon']
+
+    lat, lon, source, target = read_osm(path)
+    length = great_circle(lat[source], lon[source], lat[target], lon[target])
+
+    # Keep the shortest of parallel edges (sorted by source, target, length; first of every pair)
+    order = np.lexsort((length, target, source))
+    source, target, length = source[order], target[order], length[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (source[1:] != source[:-1]) | (target[1:] != target[:-1])
+    graph = sp.csr_matrix((length[first], (source[first], target[first])), shape=(len(lat), len(lat)))
+
+    os.makedirs(GRAPH_CACHE_DIR, exist_ok=True)
+    with atomic_write(cache_path) as f:
+        np.savez(f, data=graph.data, indices=graph.indices, indptr=graph.indptr, lat=lat, lon=lon)
+    return graph, lat, lon
+
+
+def snap(graph, lat, lon, point_lat, point_lon):
+    """
+    Nearest node of the largest strongly connected component of the graph
+    for every point (so every snapped pair is connected), and the
+    straight-line access distance (km) from the point to that node.
+    """
+    _, labels = connected_components(graph, directed=True, connection='strong')
+    component = np.flatnonzero(labels == np.bincount(labels).argmax())
+    _, nearest = cKDTree(unit_sphere(lat[component], lon[component])).query(unit_sphere(point_lat, point_lon), k=1)
+    nodes = component[nearest]
+    return nodes, great_circle(point_lat, point_lon, lat[nodes], lon[nodes])
+
+
+def road_distance_matrix(graph, lat, lon, people_lat, people_lon, poi_lat, poi_lon, max_snap_km=MAX_SNAP_KM):
+    """
+    Road distance (km) from every People node (rows) to every POI
+    (columns): access leg to the snapped node, shortest path, access leg
+    from the snapped node. Dijkstra runs once for all sources from the
+    smaller side (People on the graph, or POIs on the reversed graph).
+    Pairs with a point more than max_snap_km from the graph keep the
+    haversine distance.
+    """
+    people_nodes, people_access = snap(graph, lat, lon, people_lat, people_lon)
+    poi_nodes, poi_access = snap(graph, lat, lon, poi_lat, poi_lon)
+
+    people_sources, people_index = np.unique(people_nodes, return_inverse=True)
+    poi_sources, poi_index = np.unique(poi_nodes, return_inverse=True)
+    if len(people_sources) <= len(poi_sources):
+        paths = dijkstra(graph, directed=True, indices=people_sources)[:, poi_sources]
+    else:
+        paths = dijkstra(graph.T.tocsr(), directed=True, indices=poi_sources)[:, people_sources].T
+    dist = people_access[:, None] + paths[np.ix_(people_index, poi_index)] + poi_access[None, :]
+
+    off_network = (people_access > max_snap_km)[:, None] | (poi_access > max_snap_km)[None, :]
+    straight = haversine_matrix(people_lat, people_lon, poi_lat, poi_lon)
+    return np.where(off_network, straight, dist)
+
+
+def cache_folder(graph_path, poi_path='POI.csv', people_path='PEOPLE_OLD.csv'):
+    return os.path.join(CACHE_DIR, file_fingerprint(graph_path, poi_path, people_path))
+
+
+def build_road_distance_cache(graph_path=TEST_GRAPH, poi_path='POI.csv', people_path='PEOPLE_OLD.csv'):
+    """
+    Road distance matrix of every unit, saved as '<unit>.npy' in a folder
+    keyed by the hash of the graph and both input files (the same layout
+    as distance_matrix.build_distance_cache). Returns the folder.
+    """
+    folder = cache_folder(graph_path, poi_path, people_path)
+    os.makedirs(folder, exist_ok=True)
+
+    graph, lat, lon = road_graph(graph_path)
+    POI_df = load_table(poi_path, 'POI')
+    People_df = load_table(people_path, 'People')
+
+    for unit_name, POI_group in POI_df.groupby('Unit', sort=False, observed=True):
+        path = os.path.join(folder, f'{unit_name}.npy')
+        if os.path.exists(path):
+            continue
+        People_group = unit_rows(People_df, unit_name)
+        dist = road_distance_matrix(graph, lat, lon, People_group['Lat2'], People_group['Lon2'],
+                                    POI_group['Lat1'], POI_group['Lon1'])
+        with atomic_write(path) as f:
+            np.save(f, dist)
+
+    return folder
+
+
+def unit_road_distance_matrix(unit_name, graph_path=TEST_GRAPH, poi_path='POI.csv', people_path='PEOPLE_OLD.csv'):
+    """Road (People, POI) distance matrix of a unit as a read-only memmap, building the cache when needed."""
+    path = os.path.join(cache_folder(graph_path, poi_path, people_path), f'{unit_name}.npy')
+    if not os.path.exists(path):
+        build_road_distance_cache(graph_path, poi_path, people_path)
+    return np.load(path, mmap_mode='r')
+
+
+def write_test_graph(path=TEST_GRAPH, lat_range=(10.38, 10.68), lon_range=(106.74, 106.99), size=16,
+                     river_row=7, bridge_column=12):
+    """
+    Write the bundled test extract: a size x size grid of two-way roads
+    over Cần Giờ, with the north-south roads crossing a river (between
+    grid rows river_row and river_row + 1) only at bridge_column, and the
+    first east-west road one way.
+    """
+    lats = np.linspace(*lat_range, size)
+    lons = np.linspace(*lon_range, size)
+
+    def node_id(row, column):
+        return 1 + row * size + column
+
+    root = ET.Element('osm', version='0.6', generator='road_network.write_test_graph')
+    for row, node_lat in enumerate(lats):
+        for column, node_lon in enumerate(lons):
+            ET.SubElement(root, 'node', id=str(node_id(row, column)), lat=f'{node_lat:.7f}', lon=f'{node_lon:.7f}')
+
+    ways = [([node_id(row, column) for column in range(size)], {'highway': 'residential', 'oneway': 'yes' if row == 0 else 'no'})
+            for row in range(size)]
+    for column in range(size):
+        if column == bridge_column:
+            ways.append(([node_id(row, column) for row in range(size)], {'highway': 'primary', 'bridge': 'yes'}))
+        else:
+            ways.append(([node_id(row, column) for row in range(river_row + 1)], {'highway': 'residential'}))
+            ways.append(([node_id(row, column) for row in range(river_row + 1, size)], {'highway': 'residential'}))
+
+    for way_id, (refs, tags) in enumerate(ways, start=1):
+        way = ET.SubElement(root, 'way', id=str(way_id))
+        for ref in refs:
+            ET.SubElement(way, 'nd', ref=str(ref))
+        for key, value in tags.items():
+            ET.SubElement(way, 'tag', k=key, v=value)
+
+    ET.indent(root)
+    ET.ElementTree(root).write(path, encoding='utf-8', xml_declaration=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Road-network distance matrices from a local OSM extract.')
+    parser.add_argument('--graph', default=TEST_GRAPH, help='OSM XML extract')
+    parser.add_argument('--write-test-graph', action='store_true', help=f'(Re)write the bundled {TEST_GRAPH}')
+    parser.add_argument('--poi', default='POI.csv')
+    parser.add_argument('--people', default='PEOPLE_OLD.csv')
+    args = parser.parse_args()
+
+    if args.write_test_graph:
+        write_test_graph(args.graph)
+
+    start = time.perf_counter()
+    graph, lat, lon = road_graph(args.graph)
+    print(f"{args.graph}: {graph.shape[0]} nodes, {graph.nnz} edges ({time.perf_counter() - start:.3f} seconds)")
+
+    start = time.perf_counter()
+    folder = build_road_distance_cache(args.graph, args.poi, args.people)
+    print(f"Road distance matrices cached in {folder} ({time.perf_counter() - start:.3f} seconds)")
+
+    # Road distance against the straight line, per unit
+    POI_df = load_table(args.poi, 'POI')
+    People_df = load_table(args.people, 'People')
+    for unit_name in pd.read_csv('Unit.csv')['Unit']:
+        POI_group = unit_rows(POI_df, unit_name)
+        People_group = unit_rows(People_df, unit_name)
+        straight = haversine_matrix(People_group['Lat2'], People_group['Lon2'], POI_group['Lat1'], POI_group['Lon1'])
+        road = unit_road_distance_matrix(unit_name, args.graph, args.poi, args.people)
+        on_network = ~np.isclose(road, straight) & (straight > 0)
+        if not on_network.any():
+            print(f"{unit_name}: outside the road graph, haversine distances kept")
+            continue
+        ratio = road[on_network] / straight[on_network]
+        print(f"{unit_name}: {on_network.sum()} of {road.size} pairs on the road graph, "
+              f"road / straight-line distance median {np.median(ratio):.2f}, max {ratio.max():.2f}")
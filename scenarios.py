@@ -0,0 +1,297 @@
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from backends import highs_model, run_highs, site_milp
+from candidates import candidate_pairs, pair_values
+from costs import COST_PRESETS, DEFAULT_COSTS
+from distance_matrix import build_distance_cache, unit_distance_matrix
+from evaluator import evaluate
+from inputs import load_inputs, unit_data
+
+
+# Folder where the scenario tables are written
+SCENARIO_DIR = 'scenarios'
+
+# Scenario keys besides the DEFAULT_COSTS coefficients: scale factors of each unit's CONSTRAINT.csv values
+# and the name of a COST_PRESETS entry the cost overrides apply to
+CONSTRAINT_SCALES = {'budget_scale': 'Budget', 'demand_scale': 'Demand'}
+PRESET_KEY = 'costs'
+
+# Columns of the scenario table that only a solved scenario fills in, with their value for the others
+UNSOLVED = {**dict.fromkeys(['Objective', 'MIP gap', 'Land', 'Fixed', 'Transport', 'Capex', 'Capacity', 'X2 chargers',
+                             'X3 chargers', 'Sites'], np.nan),
+            'Feasible': False, 'X2 per POI': None, 'X3 per POI': None}
+
+
+def scenario_grid(grid):
+    """
+    Every combination of a {key: [values]} grid, in a snake order where
+    neighbouring scenarios differ in exactly one value (so a worker
+    walking the list only changes one thing between solves).
+    """
+    if not grid:
+        return [{}]
+    (key, values), rest = next(iter(grid.items())), dict(list(grid.items())[1:])
+    tail = scenario_grid(rest)
+    scenarios = []
+    for i, value in enumerate(values):
+        scenarios.extend({key: value, **scenario} for scenario in (tail if i % 2 == 0 else tail[::-1]))
+    return scenarios
+
+
+def parse_grid(specs):
+    """{key: [values]} from 'key=value,value' strings, numbers except for the cost preset names."""
+    grid = {}
+    for spec in specs:
+        key, _, values = spec.partition('=')
+        grid[key] = [value if key == PRESET_KEY else float(value) for value in values.split(',')]
+    return grid
+
+
+def read_scenarios(path):
+    """Scenarios listed one per row of a CSV file; empty cells keep the default."""
+    return [{key: value for key, value in row.items() if not pd.isna(value)}
+            for row in pd.read_csv(path).to_dict('records')]
+
+
+def scenario_costs(scenario):
+    """Cost coefficients of a scenario: its preset (DEFAULT_COSTS by default) with its overrides."""
+    unknown = set(scenario) - set(DEFAULT_COSTS) - set(CONSTRAINT_SCALES) - {PRESET_KEY}
+    if unknown:
+        raise ValueError(f"Unknown scenario keys: {', '.join(sorted(unknown))}")
+    preset = scenario.get(PRESET_KEY, 'main')
+    if preset not in COST_PRESETS:
+        raise ValueError(f"Unknown cost preset: {preset}")
+    return {**COST_PRESETS[preset], **{key: value for key, value in scenario.items() if key in DEFAULT_COSTS}}
+
+
+class ScenarioModel:
+    """
+    HiGHS model of one unit kept across scenarios. A new scenario only
+    changes the costs, bounds and coefficients that differ from the
+    previous one, and the previous placement is passed as a MIP start.
+    """
+
+    def __init__(self, mip_gap=0.0001, time_limit=None, threads=1):
+        self.options = {'mip_gap': mip_gap, 'time_limit': time_limit, 'threads': threads}
+        self.milp = None
+        self.h = None
+        self.x = None
+
+    def update(self, milp):
+        """Load the site_milp() arrays of the next scenario. Returns whether the existing model was reused."""
+        previous, self.milp = self.milp, milp
+        A = milp['A']
+        if (previous is None or previous['A'].shape != A.shape
+                or not np.array_equal(previous['A'].indptr, A.indptr) or not np.array_equal(previous['A'].indices, A.indices)):
+            self.h = highs_model(milp, **self.options)
+            self.x = None
+            return False
+
+        changed = np.flatnonzero(milp['c'] != previous['c'])
+        if len(changed):
+            self.h.changeColsCost(len(changed), changed, milp['c'][changed])
+        changed = np.flatnonzero((milp['lb'] != previous['lb']) | (milp['ub'] != previous['ub']))
+        if len(changed):
+            self.h.changeColsBounds(len(changed), changed, milp['lb'][changed], milp['ub'][changed])
+        changed = np.flatnonzero((milp['row_lb'] != previous['row_lb']) | (milp['row_ub'] != previous['row_ub']))
+        if len(changed):
+            self.h.changeRowsBounds(len(changed), changed, milp['row_lb'][changed], milp['row_ub'][changed])
+        changed = np.flatnonzero(A.data != previous['A'].data)
+        if len(changed):
+            rows = np.repeat(np.arange(A.shape[0]), np.diff(A.indptr))
+            for row, col, value in zip(rows[changed], A.indices[changed], A.data[changed]):
+                self.h.changeCoeff(int(row), int(col), float(value))
+        return True
+
+    def solve(self):
+        """Solve from the previous placement (when there is one); x is None when no solution was found."""
+        import highspy
+
+        if self.x is not None:
+            start = highspy.HighsSolution()
+            start.col_value = self.x
+            start.value_valid = True
+            self.h.setSolution(start)
+        solution = run_highs(self.h)
+        self.x = solution['x']
+        return solution
+
+
+def sweep_unit(unit_name, scenarios, k_nearest=None, radius_km=None, mip_gap=0.0001, time_limit=None, road_graph=None,
+               poi_path='POI.csv', people_path='PEOPLE_OLD.csv'):
+    """
+    Worker: solve one unit under a run of neighbouring scenarios with a
+    single ScenarioModel. scenarios is a list of (scenario number,
+    overrides); returns one row per scenario with the objective terms,
+    the budget and capacity used and the chargers per POI.
+    """
+    inputs = load_inputs(poi_path, people_path)
+    POI_group, People_group, Budget, Demand, Slot = unit_data(unit_name, *inputs)
+    dist = unit_distance_matrix(unit_name, poi_path, people_path, road_graph=road_graph)
+    pairs = candidate_pairs(People_group, POI_group, k_nearest=k_nearest, radius_km=radius_km,
+                            dist=dist if road_graph is not None else None)
+    model = ScenarioModel(mip_gap=mip_gap, time_limit=time_limit)
+
+    rows = []
+    for number, scenario in scenarios:
+        costs = scenario_costs(scenario)
+        unit_budget = Budget * scenario.get('budget_scale', 1.0)
+        unit_demand = Demand * scenario.get('demand_scale', 1.0)
+
+        start = time.perf_counter()
+        milp = site_milp(POI_group, dist, unit_budget, unit_demand, costs=costs, pairs=pairs)
+        reused = model.update(milp)
+        warm_start = model.x is not None
+        update_time = time.perf_counter() - start
+        solution = model.solve()
+
+        row = {'Scenario': number, 'Unit': unit_name, **scenario, 'Budget': unit_budget, 'Demand': unit_demand,
+               'Status': solution['status'], 'Model reused': reused, 'Warm start': warm_start,
+               'Update time': update_time, 'Solve time': solution['solve_time'], **UNSOLVED}
+        if solution['x'] is not None:
+            columns = milp['columns']
+            x2 = pair_values(solution['x'][columns['x2']], milp['pairs'], milp['shape']).round()
+            x3 = pair_values(solution['x'][columns['x3']], milp['pairs'], milp['shape']).round()
+            evaluation = evaluate(x2, x3, POI_group['Land_Cost'], dist, unit_budget, unit_demand, costs=costs)
+            x2_poi, x3_poi = x2.sum(axis=0), x3.sum(axis=0)
+            row.update({
+                'Objective': solution['objective'],
+                'MIP gap': solution['mip_gap'],
+                'Land': float(evaluation['land']),
+                'Fixed': float(evaluation['fixed']),
+                'Transport': float(evaluation['transport']),
+                'Capex': costs['capex_x2'] * x2_poi.sum() + costs['capex_x3'] * x3_poi.sum(),
+                'Capacity': costs['capacity_x2'] * x2_poi.sum() + costs['capacity_x3'] * x3_poi.sum(),
+                'X2 chargers': int(x2_poi.sum()),
+                'X3 chargers': int(x3_poi.sum()),
+                'Sites': int(((x2_poi + x3_poi) > 0).sum()),
+                'Feasible': bool(evaluation['feasible']),
+                'X2 per POI': x2_poi.astype(int).tolist(),
+                'X3 per POI': x3_poi.astype(int).tolist(),
+            })
+        rows.append(row)
+    return rows
+
+
+def sweep(units, scenarios, workers=None, chunk_size=None, **options):
+    """
+    Solve every unit under every scenario across a process pool.
+
+    Each task is one unit with a contiguous run of chunk_size scenarios,
+    so the model is built once per task and every following scenario
+    reuses it with the previous placement as a warm start. By default
+    the scenarios of a unit are split just enough to keep every worker
+    busy, and the largest units are submitted first.
+    """
+    poi_path, people_path = options.get('poi_path', 'POI.csv'), options.get('people_path', 'PEOPLE_OLD.csv')
+    POI_df, People_df = load_inputs(poi_path, people_path)[:2]
+
+    # Build the distance cache once here, so the workers only read it
+    if options.get('road_graph') is not None:
+        from road_network import build_road_distance_cache
+        build_road_distance_cache(options['road_graph'], poi_path, people_path)
+    else:
+        build_distance_cache(poi_path, people_path)
+
+    sizes = POI_df['Unit'].value_counts() * People_df['Unit'].value_counts()
+    units = sorted(units, key=lambda unit: sizes.get(unit, 0), reverse=True)
+
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = math.ceil(len(scenarios) / max(1, math.ceil(workers / len(units))))
+    numbered = list(enumerate(scenarios))
+    chunks = [numbered[i:i + chunk_size] for i in range(0, len(numbered), chunk_size)]
+    print(f"Solving {len(units)} units x {len(scenarios)} scenarios as {len(units) * len(chunks)} tasks on {workers} workers")
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(sweep_unit, unit, chunk, **options) for unit in units for chunk in chunks]
+        for future in as_completed(futures):
+            rows.extend(future.result())
+    return pd.DataFrame(rows).sort_values(['Scenario', 'Unit'], ignore_index=True)
+
+
+def pareto_front(df, minimize=('Objective',), maximize=('Capacity',)):
+    """Boolean Series flagging the rows no other row beats on every column (ties allowed) and strictly on one."""
+    values = np.hstack([df[list(minimize)].to_numpy(dtype=float), -df[list(maximize)].to_numpy(dtype=float)])
+    no_worse = (values[:, None, :] <= values[None, :, :]).all(axis=2)
+    better = (values[:, None, :] < values[None, :, :]).any(axis=2)
+    dominated = (no_worse & better).any(axis=0)
+    return pd.Series(~dominated, index=df.index)
+
+
+def pareto_summary(table):
+    """
+    Totals over the units of every scenario (objective, budget and
+    capacity used, chargers), with the scenarios on the cost / capacity
+    Pareto front flagged. Scenarios with an unsolved or infeasible unit
+    are never on the front.
+    """
+    keys = [column for column in table.columns
+            if column in DEFAULT_COSTS or column in CONSTRAINT_SCALES or column == PRESET_KEY]
+    table = table.assign(**{column: default for column, default in UNSOLVED.items() if column not in table})
+    table = table.assign(Solved=table['Feasible'].eq(True))
+    totals = ['Objective', 'Land', 'Fixed', 'Transport', 'Capex', 'Capacity', 'X2 chargers', 'X3 chargers', 'Sites']
+    summary = (table.groupby('Scenario')
+               .agg(**{key: (key, 'first') for key in keys},
+                    **{column: (column, 'sum') for column in totals + ['Solve time']},
+                    Solved=('Solved', 'all'))
+               .reset_index())
+    summary.loc[~summary['Solved'], totals] = np.nan
+    summary['Pareto'] = False
+    solved = summary['Solved']
+    summary.loc[solved, 'Pareto'] = pareto_front(summary[solved])
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve every unit under a grid or list of Budget, Demand and cost scenarios.')
+    parser.add_argument('--grid', action='append', default=[], metavar='KEY=VALUE,VALUE',
+                        help="Scenario values of one key: 'budget_scale', 'demand_scale', a DEFAULT_COSTS "
+                             f"coefficient or '{PRESET_KEY}' ({', '.join(COST_PRESETS)}); repeat for a grid")
+    parser.add_argument('--scenarios', default=None, help='CSV file with one scenario per row (columns are scenario keys)')
+    parser.add_argument('--units', nargs='*', default=None, help='Units to solve (default: every unit of Unit.csv)')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=None, help='Scenarios solved in a row by one model')
+    parser.add_argument('--k-nearest', type=int, default=None)
+    parser.add_argument('--radius-km', type=float, default=None)
+    parser.add_argument('--mip-gap', type=float, default=0.0001)
+    parser.add_argument('--time-limit', type=float, default=None, help='Seconds per scenario and unit')
+    parser.add_argument('--road-graph', default=None, help='Price transportation on the road distances of this OSM extract')
+    parser.add_argument('--output-dir', default=SCENARIO_DIR)
+    parser.add_argument('--name', default='sweep', help='Name of the output files')
+    args = parser.parse_args()
+
+    grid = parse_grid(args.grid) if args.grid else {PRESET_KEY: list(COST_PRESETS), 'demand_scale': [0.9, 1.0, 1.1]}
+    scenarios = read_scenarios(args.scenarios) if args.scenarios else scenario_grid(grid)
+    for scenario in scenarios:
+        scenario_costs(scenario)
+    units = args.units or list(pd.read_csv('Unit.csv')['Unit'])
+
+    start = time.perf_counter()
+    table = sweep(units, scenarios, workers=args.workers, chunk_size=args.chunk_size, k_nearest=args.k_nearest,
+                  radius_km=args.radius_km, mip_gap=args.mip_gap, time_limit=args.time_limit, road_graph=args.road_graph)
+    wall_time = time.perf_counter() - start
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    table_path = os.path.join(args.output_dir, f'{args.name}.parquet')
+    table.to_parquet(table_path, index=False)
+    summary = pareto_summary(table)
+    summary_path = os.path.join(args.output_dir, f'{args.name}_pareto.csv')
+    summary.to_csv(summary_path, index=False)
+
+    reused = table['Model reused']
+    print(f"{len(table)} solves in {wall_time:.2f}s (sum of solve times {table['Solve time'].sum():.2f}s), "
+          f"{int(reused.sum())} reused a model (update {table.loc[reused, 'Update time'].mean() * 1000:.1f} ms on average "
+          f"against {table.loc[~reused, 'Update time'].mean() * 1000:.1f} ms for a build), "
+          f"{int(table['Warm start'].sum())} warm started")
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(summary.to_string(index=False))
+    print(f"Table written to {table_path}, Pareto summary to {summary_path}")
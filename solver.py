@@ -0,0 +1,219 @@
+import os
+import time
+
+import gurobipy as gp
+import numpy as np
+
+from candidates import candidate_pairs, pair_values, pruning_report
+from distance_matrix import unit_distance_matrix
+from inputs import load_inputs, unit_data
+from model_builder import build_model, build_site_model
+from model_cache import load_model, model_fingerprint, save_model
+from profiler import stage
+from results import read_result_matrices
+from telemetry import Telemetry
+
+
+# Define the callback function to collect data during optimization
+def data_cb(model, where):
+    if where == gp.GRB.Callback.MIP:
+        cur_obj = model.cbGet(gp.GRB.Callback.MIP_OBJBST)
+        cur_bd = model.cbGet(gp.GRB.Callback.MIP_OBJBND)
+        now = time.perf_counter() - model._start  # Higher precision time capture
+
+        # Did objective value or best bound change?
+        if model._obj != cur_obj or model._bd != cur_bd:
+            model._obj = cur_obj
+            model._bd = cur_bd
+            model._data.append([now, cur_obj, cur_bd, 'MIP'])
+
+        if model._telemetry is not None:
+            model._telemetry.record(now, 'MIP', cur_obj, cur_bd,
+                                    nodes=model.cbGet(gp.GRB.Callback.MIP_NODCNT),
+                                    nodes_left=model.cbGet(gp.GRB.Callback.MIP_NODLFT),
+                                    solutions=model.cbGet(gp.GRB.Callback.MIP_SOLCNT),
+                                    iterations=model.cbGet(gp.GRB.Callback.MIP_ITRCNT))
+
+    elif where == gp.GRB.Callback.MIPSOL:
+        # New incumbent (including an accepted MIP start)
+        now = time.perf_counter() - model._start
+        if model._first_incumbent is None:
+            model._first_incumbent = now
+        cur_obj = model.cbGet(gp.GRB.Callback.MIPSOL_OBJBST)
+        cur_bd = model.cbGet(gp.GRB.Callback.MIPSOL_OBJBND)
+        model._data.append([now, cur_obj, cur_bd, 'MIPSOL'])
+
+        if model._telemetry is not None:
+            nodes = model.cbGet(gp.GRB.Callback.MIPSOL_NODCNT)
+            # The best objective does not include the new solution yet
+            best_obj = min(cur_obj, model.cbGet(gp.GRB.Callback.MIPSOL_OBJ))
+            model._telemetry.record(now, 'MIPSOL', best_obj, cur_bd, nodes=nodes,
+                                    solutions=model.cbGet(gp.GRB.Callback.MIPSOL_SOLCNT),
+                                    source='root' if nodes == 0 else 'tree')
+
+    elif where == gp.GRB.Callback.PRESOLVE and model._telemetry is not None:
+        model._telemetry.record_presolve({
+            'rows_removed': model.cbGet(gp.GRB.Callback.PRE_ROWDEL),
+            'columns_removed': model.cbGet(gp.GRB.Callback.PRE_COLDEL),
+            'senses_changed': model.cbGet(gp.GRB.Callback.PRE_SENCHG),
+            'bounds_changed': model.cbGet(gp.GRB.Callback.PRE_BNDCHG),
+            'coefficients_changed': model.cbGet(gp.GRB.Callback.PRE_COECHG),
+        })
+
+
+def load_start(unit_name, start, inputs=None, poi_path='POI.csv', people_path='PEOPLE_OLD.csv', road_graph=None):
+    """
+    Resolve a MIP start into a dict with dense x2/x3 (and optionally b) values:
+    - 'heuristic': the greedy + local-search placement of heuristic.py, on
+      the same (straight-line or road_graph) distances as the model;
+    - a path to a results_unit_*.parquet/.csv file (e.g. from an earlier run);
+    - a result dict, e.g. the previous scenario of a sweep.
+    """
+    if isinstance(start, dict):
+        return start
+    if start == 'heuristic':
+        from heuristic import solve_unit_heuristic
+        return solve_unit_heuristic(unit_name, inputs=inputs, poi_path=poi_path, people_path=people_path,
+                                    road_graph=road_graph)
+    if isinstance(start, str) and os.path.exists(start):
+        return read_result_matrices(start)
+    raise ValueError(f"Unknown MIP start: {start}")
+
+
+def set_start(model, x2, x3, b, start):
+    """Set the Start attribute of x2, x3 and b (or of the site variables) from dense matrices."""
+    rows, cols = model._pairs
+    x2_start = np.asarray(start['x2_values'], dtype=float)
+    x3_start = np.asarray(start['x3_values'], dtype=float)
+    if x2_start.shape != model._shape or x3_start.shape != model._shape:
+        raise ValueError(f"MIP start of shape {x2_start.shape} does not match the {model._shape} model")
+
+    x2.Start = x2_start[rows, cols]
+    x3.Start = x3_start[rows, cols]
+    if b is not None:
+        b_start = start.get('b_values')
+        b_start = np.asarray(b_start, dtype=float) if b_start is not None else (x2_start + x3_start > 0).astype(float)
+        b.Start = b_start[rows, cols]
+    if hasattr(model, '_site_vars'):
+        y2, y3, o = model._site_vars
+        y2.Start = x2_start.sum(axis=0)
+        y3.Start = x3_start.sum(axis=0)
+        o.Start = (x2_start.sum(axis=0) + x3_start.sum(axis=0) > 0).astype(float)
+
+
+def solve_unit(unit_name, inputs=None, env=None, formulation='pair', linearize=False, mip_gap=0.0001, params=None,
+               k_nearest=None, radius_km=None, start=None, model_cache=False, rebuild_model=False, telemetry=False,
+               road_graph=None, poi_path='POI.csv', people_path='PEOPLE_OLD.csv'):
+    """
+    Build and solve the model of one unit.
+
+    inputs is the (POI_df, People_df, Constraint_df) tuple of load_inputs(),
+    loaded from disk when not given. formulation is 'pair' (x2/x3/b per
+    People-POI pair, optionally linearized) or 'site' (see
+    build_site_model). With k_nearest and/or radius_km, variables are
+    only created for the candidate pairs of candidates.candidate_pairs.
+    start is an optional MIP start (see load_start). With model_cache the
+    built model is read from / written to model_cache.py, keyed by the
+    unit's inputs; rebuild_model forces a fresh build. telemetry records
+    the solve progress with telemetry.Telemetry (True, 'jsonl' or
+    'parquet'). road_graph prices transportation on road-network instead
+    of straight-line distances (see road_network.py). Returns a dict with the dense x2/x3/b values, the
+    objective and the build/solve/pruning statistics.
+    """
+    if inputs is None:
+        inputs = load_inputs(poi_path, people_path)
+    POI_group, People_group, Budget, Demand, Slot = unit_data(unit_name, *inputs)
+    with stage('distance matrix'):
+        dist_matrix = unit_distance_matrix(unit_name, poi_path, people_path, road_graph=road_graph)
+
+    # Keep only the candidate People-POI pairs (every pair when no pruning is requested)
+    with stage('candidate pairs'):
+        pairs = candidate_pairs(People_group, POI_group, k_nearest=k_nearest, radius_km=radius_km,
+                                dist=dist_matrix if road_graph is not None else None)
+    pruning = pruning_report(pairs, *dist_matrix.shape, formulation=formulation)
+    print(f"Candidate pairs: {pruning['pairs']} of {pruning['full_pairs']}, "
+          f"pruned variables: {pruning['pruned_variables']}")
+
+    # Load the built model from the cache, or build it (and cache it)
+    cached = None
+    if model_cache:
+        with stage('model load'):
+            key = model_fingerprint(POI_group, People_group, Budget, Demand, dist_matrix, formulation, linearize, pairs)
+            cached = None if rebuild_model else load_model(key, env=env)
+
+    if cached is not None:
+        model, variables = cached
+        x2, x3, b = variables['x2'], variables['x3'], variables.get('b')
+        print(f"Model loaded from cache in {model._build_time:.3f} seconds")
+    else:
+        with stage('model build'):
+            if formulation == 'site':
+                model, x2, x3, b = build_site_model(POI_group, dist_matrix, Budget, Demand, env=env, pairs=pairs)
+            elif formulation == 'pair':
+                model, x2, x3, b = build_model(POI_group, dist_matrix, Budget, Demand, env=env, linearize=linearize, pairs=pairs)
+            else:
+                raise ValueError(f"Unknown formulation: {formulation}")
+        if model_cache:
+            with stage('model save'):
+                y2, y3, o = getattr(model, '_site_vars', (None, None, None))
+                save_model(key, model, {'x2': x2, 'x3': x3, 'b': b, 'y2': y2, 'y3': y3, 'o': o})
+
+    # MIP start from a heuristic, an earlier result file or a previous scenario
+    if start is not None:
+        try:
+            set_start(model, x2, x3, b, load_start(unit_name, start, inputs, poi_path, people_path, road_graph))
+        except ValueError as e:
+            print(f"Ignoring MIP start: {e}")
+
+    # Initialize callback data
+    model._obj = None
+    model._bd = None
+    model._data = []
+    model._first_incumbent = None
+    model._telemetry = None
+    if telemetry:
+        model._telemetry = Telemetry(unit_name, target_gap=mip_gap,
+                                     file_format=telemetry if telemetry in ('jsonl', 'parquet') else 'jsonl')
+    model._start = time.perf_counter()  # Start with high-precision timer
+
+    model.setParam('MIPGap', mip_gap)
+    for name, value in (params or {}).items():
+        model.setParam(name, value)
+    with stage('optimize'):
+        model.optimize(callback=data_cb)
+    if model.SolCount == 0:
+        status = model.Status
+        if model._telemetry is not None:
+            model._telemetry.close()
+        model.dispose()
+        raise RuntimeError(f"{unit_name}: Gurobi found no feasible solution (status {status})")
+
+    with stage('extract'):
+        x2_values = pair_values(x2.X, model._pairs, dist_matrix.shape)
+        x3_values = pair_values(x3.X, model._pairs, dist_matrix.shape)
+        # The site formulation has no b variables: a pair is used when chargers are assigned to it
+        if b is not None:
+            b_values = pair_values(b.X, model._pairs, dist_matrix.shape)
+        else:
+            b_values = (x2_values + x3_values > 0.5).astype(float)
+
+    result = {
+        'unit': unit_name,
+        'formulation': formulation,
+        'x2_values': x2_values,
+        'x3_values': x3_values,
+        'b_values': b_values,
+        'optimal_solution': model.ObjVal,
+        'build_time': model._build_time,
+        'solve_time': model.Runtime,
+        'mip_gap': model.MIPGap,
+        'status': model.Status,
+        'first_incumbent_time': model._first_incumbent,
+        'pruning': pruning,
+        'poi_coordinates': POI_group[['Lat1', 'Lon1']].to_numpy(dtype=float),
+        'people_coordinates': People_group[['Lat2', 'Lon2']].to_numpy(dtype=float),
+        'callback_data': model._data,
+        'telemetry': model._telemetry.close() if model._telemetry is not None else None,
+    }
+    model.dispose()
+    return result
@@ -0,0 +1,70 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from costs import DEFAULT_COSTS
+
+
+# Ho Chi Minh City bounding box (latitude, longitude)
+HCM_BBOX = ((10.37, 11.16), (106.36, 107.03))
+
+# Shape of the real units: Demand per POI, Budget relative to covering Demand with x3 chargers, land cost
+DEMAND_PER_POI = 60
+BUDGET_RATIO = 12
+LAND_COST_MEDIAN = 9.2e7
+LAND_COST_SIGMA = 0.7
+
+
+def synthetic_unit(n_poi, n_people=None, seed=0, unit_name='Synthetic', costs=None):
+    """
+    Random unit inside the Ho Chi Minh City bounding box, in the input
+    schema: (POI_df, People_df, Constraint_df). Demand and Budget scale
+    with the POI count like the real units, so every instance is feasible.
+    """
+    costs = {**DEFAULT_COSTS, **(costs or {})}
+    rng = np.random.default_rng(seed)
+    n_people = n_people or max(1, n_poi // 10)
+    (lat_min, lat_max), (lon_min, lon_max) = HCM_BBOX
+
+    POI_df = pd.DataFrame({
+        'STT': np.arange(1, n_poi + 1),
+        'Lat1': rng.uniform(lat_min, lat_max, n_poi),
+        'Lon1': rng.uniform(lon_min, lon_max, n_poi),
+        'Land_Cost': np.round(rng.lognormal(np.log(LAND_COST_MEDIAN), LAND_COST_SIGMA, n_poi), -5),
+        'Unit': unit_name,
+    })
+    People_df = pd.DataFrame({
+        'STT': np.arange(1, n_people + 1),
+        'Lat2': rng.uniform(lat_min, lat_max, n_people),
+        'Lon2': rng.uniform(lon_min, lon_max, n_people),
+        'Unit': unit_name,
+    })
+
+    Demand = DEMAND_PER_POI * n_poi
+    Budget = BUDGET_RATIO * costs['budget_days'] * Demand * costs['capex_x3'] / costs['capacity_x3']
+    Constraint_df = pd.DataFrame({'Unit': [unit_name], 'Budget': [round(Budget)], 'Demand': [Demand],
+                                  'Slot': [int(np.ceil(Demand / costs['capacity_x3']))]})
+    return POI_df, People_df, Constraint_df
+
+
+def write_synthetic_inputs(folder, n_poi, n_people=None, seed=0, unit_name='Synthetic'):
+    """Write POI.csv, PEOPLE.csv and CONSTRAINT.csv of a synthetic unit. Returns their paths."""
+    os.makedirs(folder, exist_ok=True)
+    paths = tuple(os.path.join(folder, name) for name in ('POI.csv', 'PEOPLE.csv', 'CONSTRAINT.csv'))
+    for df, path in zip(synthetic_unit(n_poi, n_people, seed, unit_name), paths):
+        df.to_csv(path, index=False)
+    return paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic unit in the input CSV format.')
+    parser.add_argument('--poi', type=int, required=True, help='Number of candidate POI')
+    parser.add_argument('--people', type=int, default=None, help='Number of demand nodes (default: POI / 10)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output-dir', default='cache/synthetic')
+    args = parser.parse_args()
+
+    paths = write_synthetic_inputs(args.output_dir, args.poi, args.people, args.seed)
+    print(f"Synthetic unit written to {', '.join(paths)}")
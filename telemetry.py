@@ -0,0 +1,182 @@
+import argparse
+import glob
+import json
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# Folder where the per-unit telemetry files are written
+TELEMETRY_DIR = 'telemetry'
+
+# Fields of one record, kept in a preallocated structured ring buffer
+RECORD_DTYPE = np.dtype([
+    ('time', 'f8'),
+    ('event', 'u1'),
+    ('objective', 'f8'),
+    ('bound', 'f8'),
+    ('gap', 'f8'),
+    ('nodes', 'f8'),
+    ('nodes_left', 'f8'),
+    ('solutions', 'i4'),
+    ('iterations', 'f8'),
+    ('source', 'u1'),
+])
+EVENTS = ['MIP', 'MIPSOL']
+SOURCES = ['', 'root', 'tree']  # Node of a new incumbent: root node (heuristics, MIP start) or branch-and-bound tree
+
+# Gaps reported by the time-to-gap summary
+SUMMARY_GAPS = {'1%': 0.01, '0.1%': 0.001}
+
+
+def relative_gap(objective, bound):
+    """Gurobi's relative MIP gap |objective - bound| / |objective| (inf without an incumbent or a bound)."""
+    if not (math.isfinite(objective) and math.isfinite(bound)) or max(abs(objective), abs(bound)) >= 1e100:
+        return math.inf
+    if objective == 0:
+        return 0.0 if bound == 0 else math.inf
+    return abs(objective - bound) / abs(objective)
+
+
+class Telemetry:
+    """
+    Solver telemetry of one unit. record() writes into a preallocated ring
+    buffer; the buffer is flushed to <unit>.jsonl or <unit>.parquet when it
+    is full or at most every flush_interval seconds, so a callback only
+    pays for one row assignment. MIP progress rows are throttled to
+    sample_interval seconds unless the objective or bound changes.
+    """
+
+    def __init__(self, unit_name, target_gap=0.0001, output_dir=TELEMETRY_DIR, file_format='jsonl',
+                 capacity=4096, flush_interval=5.0, sample_interval=1.0):
+        self.unit_name = unit_name
+        self.target_gap = target_gap
+        self.file_format = file_format
+        self.path = os.path.join(output_dir, f'telemetry_{unit_name}.{file_format}')
+        self.summary_path = os.path.join(output_dir, f'summary_{unit_name}.json')
+        os.makedirs(output_dir, exist_ok=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+        self.buffer = np.zeros(capacity, dtype=RECORD_DTYPE)
+        self.count = 0
+        self.flush_interval = flush_interval
+        self.sample_interval = sample_interval
+        self.last_flush = time.perf_counter()
+        self.last_sample = -math.inf
+        self.last_values = None
+        self.writer = None
+
+        self.records = 0
+        self.presolve = {}
+        self.first_incumbent = None
+        self.time_to_gap = dict.fromkeys([*SUMMARY_GAPS, 'target'])
+
+    def record(self, t, event, objective=math.nan, bound=math.nan, nodes=math.nan, nodes_left=math.nan,
+               solutions=0, iterations=math.nan, source=''):
+        """Add one record (MIP rows are dropped when nothing changed within sample_interval)."""
+        if event == 'MIP':
+            if (objective, bound) == self.last_values and t - self.last_sample < self.sample_interval:
+                return
+            self.last_values = (objective, bound)
+            self.last_sample = t
+
+        gap = relative_gap(objective, bound)
+        self.buffer[self.count] = (t, EVENTS.index(event), objective, bound, gap, nodes, nodes_left,
+                                   solutions, iterations, SOURCES.index(source))
+        self.count += 1
+        self.records += 1
+
+        if event == 'MIPSOL' and self.first_incumbent is None:
+            self.first_incumbent = t
+        for label, threshold in (*SUMMARY_GAPS.items(), ('target', self.target_gap)):
+            if self.time_to_gap[label] is None and gap <= threshold:
+                self.time_to_gap[label] = t
+
+        if self.count == len(self.buffer) or time.perf_counter() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def record_presolve(self, stats):
+        """Latest presolve statistics (rows/columns removed, bound changes, ...)."""
+        self.presolve = stats
+
+    def rows(self):
+        """Buffered records as a dict of columns, with the event and source names."""
+        data = self.buffer[:self.count]
+        columns = {name: data[name] for name in RECORD_DTYPE.names}
+        columns['event'] = np.array(EVENTS)[columns['event']]
+        columns['source'] = np.array(SOURCES)[columns['source']]
+        return columns
+
+    def flush(self):
+        """Append the buffered records to the telemetry file and empty the buffer."""
+        self.last_flush = time.perf_counter()
+        if self.count == 0:
+            return
+        columns = self.rows()
+        if self.file_format == 'parquet':
+            table = pa.table(columns)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            self.writer.write_table(table)
+        else:
+            frame = pd.DataFrame(columns)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                frame.to_json(f, orient='records', lines=True)
+        self.count = 0
+
+    def summary(self):
+        return {
+            'unit': self.unit_name,
+            'records': self.records,
+            'first_incumbent_time': self.first_incumbent,
+            **{f'time_to_{label}': value for label, value in self.time_to_gap.items()},
+            'target_gap': self.target_gap,
+            'presolve': self.presolve,
+        }
+
+    def close(self):
+        """Flush the remaining records and write the per-unit summary JSON. Returns the summary."""
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        summary = self.summary()
+        with open(self.summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        return summary
+
+
+def read_telemetry(path):
+    """Records of a telemetry_<unit>.jsonl or .parquet file."""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_json(path, lines=True)
+
+
+def summary_table(output_dir=TELEMETRY_DIR):
+    """Time to first incumbent, 1%, 0.1% and target gap of every unit with a telemetry summary."""
+    rows = []
+    for path in sorted(glob.glob(os.path.join(output_dir, 'summary_*.json'))):
+        with open(path, encoding='utf-8') as f:
+            summary = json.load(f)
+        summary.pop('presolve', None)
+        rows.append(summary)
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Summarize the solver telemetry of every unit.')
+    parser.add_argument('--telemetry-dir', default=TELEMETRY_DIR)
+    args = parser.parse_args()
+
+    table = summary_table(args.telemetry_dir)
+    output_file_path = os.path.join(args.telemetry_dir, 'summary.csv')
+    table.to_csv(output_file_path, index=False)
+    print(table.to_string(index=False))
+    print(f"Summary saved to {output_file_path}")
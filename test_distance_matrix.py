@@ -0,0 +1,31 @@
+import math
+
+import numpy as np
+
+from distance_matrix import R, haversine, haversine_matrix
+
+
+def test_haversine_known_distances():
+    # 1 degree along a meridian and along the equator is R * pi / 180 km
+    one_degree = R * math.pi / 180
+    assert abs(haversine(10.0, 106.0, 11.0, 106.0) - one_degree) < 1e-9
+    assert abs(haversine(0.0, 106.0, 0.0, 107.0) - one_degree) < 1e-9
+    assert haversine(10.8, 106.7, 10.8, 106.7) == 0.0
+
+
+def test_haversine_known_pair():
+    # Two points in Ho Chi Minh City; a swapped coordinate (e.g. dlon from lat2 - lon1) is off by thousands of km
+    assert abs(haversine(10.8231, 106.6297, 10.7769, 106.7009) - 9.320418672) < 1e-6
+
+
+def test_matrix_matches_scalar():
+    people_lat = np.array([10.70, 10.75, 10.82])
+    people_lon = np.array([106.60, 106.72, 106.80])
+    poi_lat = np.array([10.40, 10.78])
+    poi_lon = np.array([106.90, 106.65])
+
+    dist = haversine_matrix(people_lat, people_lon, poi_lat, poi_lon)
+    assert dist.shape == (3, 2)
+    for j in range(3):
+        for i in range(2):
+            assert abs(dist[j, i] - haversine(poi_lat[i], poi_lon[i], people_lat[j], people_lon[j])) < 1e-9
@@ -0,0 +1,52 @@
+import numpy as np
+
+from evaluator import evaluate
+
+
+# Two people, two POIs, a budget large enough that a Budget-scaled tolerance would hide small violations
+LAND_COST = np.array([1_000_000.0, 2_000_000.0])
+DIST = np.array([[1.0, 2.0], [3.0, 4.0]])
+BUDGET = 242_442_773_522
+DEMAND = 100
+
+
+def placement(x2, x3):
+    return np.array(x2, dtype=float), np.array(x3, dtype=float)
+
+
+def test_feasible_placement():
+    x2, x3 = placement([[1, 0], [0, 0]], [[0, 0], [1, 0]])
+    assert evaluate(x2, x3, LAND_COST, DIST, BUDGET, DEMAND)['feasible']
+
+
+def test_site_cap_violation_is_infeasible():
+    x2, x3 = placement([[7, 0], [0, 0]], [[0, 0], [1, 0]])
+    evaluation = evaluate(x2, x3, LAND_COST, DIST, BUDGET, DEMAND)
+    assert evaluation['site_cap'] == 1
+    assert not evaluation['feasible']
+
+
+def test_integrality_violation_is_infeasible():
+    x2, x3 = placement([[1.5, 0], [0, 0]], [[0, 0], [1, 0]])
+    evaluation = evaluate(x2, x3, LAND_COST, DIST, BUDGET, DEMAND)
+    assert evaluation['integrality'] == 0.5
+    assert not evaluation['feasible']
+
+
+def test_batch_flags_each_placement():
+    x2 = np.array([[[1, 0], [0, 0]], [[7, 0], [0, 0]]], dtype=float)
+    x3 = np.array([[[0, 0], [1, 0]], [[0, 0], [1, 0]]], dtype=float)
+    assert evaluate(x2, x3, LAND_COST, DIST, BUDGET, DEMAND)['feasible'].tolist() == [True, False]
+
+
+def test_cost_terms_match_hand_computation():
+    # Both chargers at POI 0: x2 serves person 0 (1 km), x3 serves person 1 (3 km), b = 1 on both pairs
+    x2, x3 = placement([[1, 0], [0, 0]], [[0, 0], [1, 0]])
+    evaluation = evaluate(x2, x3, LAND_COST, DIST, BUDGET, DEMAND)
+    land = (1 + 1) * 2 * 1_000_000.0 / 14600
+    fixed = 439621 * 2 + 2173018 * 2
+    transport = 38868 * 1.0 + 212005 * 3.0
+    assert abs(evaluation['land'] - land) < 1e-6
+    assert abs(evaluation['fixed'] - fixed) < 1e-6
+    assert abs(evaluation['transport'] - transport) < 1e-6
+    assert abs(evaluation['objective'] - (land + fixed + transport)) < 1e-6